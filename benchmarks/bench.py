@@ -0,0 +1,454 @@
+"""Benchmarks for the dreambox integration
+
+Runs the calls the integration makes against local fake boxes and prints
+the timings as JSON, so that regressions in setup, polling, browse or
+play_media lookup cost can be compared between revisions.
+
+    python -m benchmarks.bench --services 10,1000,10000 --boxes 1,10,50
+
+The phases map to the integration as follows:
+
+* ``setup_cold``: what ``async_setup_entry`` waits for with a new box,
+  the first coordinator refresh fetching device information, power
+  state, current service and all bouquets.
+* ``setup_cached``: what ``async_setup_entry`` waits for with a known
+  box, restoring the persisted snapshot, the refresh runs in background.
+* ``update``: one coordinator refresh per box, all boxes at once.
+* ``browse``: building the library, the largest bouquet and the first
+  A-Z page of it with the browse builders of the media player entity.
+* ``play_media``: resolving a service by reference and by channel name.
+* ``search``: prefix and substring channel search, the first run builds
+  the search index.
+* ``health``: one fetch of all health groups, as merged into a poll.
+* ``timers``: syncing a week of timers onto an empty box, then the same
+  plan again, which sends nothing but a timer list fetch at most.
+* ``keys``: a menu navigation key sequence sent by the remote entity.
+* ``requests``: the per endpoint statistics the client recorded.
+
+The coordinators and entities run on a bare Home Assistant instance.
+Pass ``--max-ms phase=ms`` to fail with exit code 1 when the p95 of a
+phase, e.g. ``setup_cold`` or ``browse.bouquet``, exceeds the limit,
+``DEFAULT_MAX_MS`` applies otherwise.
+
+Needs the dependencies of the integration (Home Assistant, aiohttp and
+dreamboxapi) to be installed.
+"""
+import argparse
+import asyncio
+import inspect
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from types import MappingProxyType
+
+import aiohttp
+from homeassistant import config_entries
+from homeassistant.const import CONF_HOST, CONF_NAME
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from dreambox.client import DreamboxClient
+from dreambox.const import DOMAIN, STORAGE_VERSION
+from dreambox.coordinator import DreamboxDataUpdateCoordinator, storage_key
+from dreambox.health import HEALTH_INTERVALS, HealthMonitor
+from dreambox.media_player import DreamboxDevice
+from dreambox.scheduler import PollScheduler
+from dreambox.timers import Timer, TimerCache
+
+from .fake_webif import FakeBox, start
+
+# a week of eight recordings a day
+TIMER_PLAN = 7 * 8
+
+# menu, down to the eighth entry, in, right twice, back out
+KEY_SEQUENCE = [139] + [108] * 7 + [352, 106, 106, 174, 174, 174]
+
+# p95 limits in milliseconds, generous enough for 10000 services per bouquet
+DEFAULT_MAX_MS = {
+    "setup_cold": 5000,
+    "setup_cached": 3000,
+    "update.1": 1000,
+    "browse.library": 10,
+    "browse.bouquet": 50,
+    "browse.page": 50,
+    "play_media.by_ref": 1,
+    "play_media.by_name": 1,
+    "play_media.miss": 1,
+    "search.prefix": 10,
+    "search.substring": 50,
+}
+
+
+def _summary(samples):
+    """Return latency statistics in milliseconds."""
+    samples = sorted(samples)
+    if not samples:
+        return {"count": 0}
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    return {
+        "count": len(samples),
+        "min_ms": samples[0] * 1000,
+        "median_ms": statistics.median(samples) * 1000,
+        "p95_ms": p95 * 1000,
+        "max_ms": samples[-1] * 1000,
+    }
+
+
+def _timed(func, *args, repeat=1):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = func(*args)
+        samples.append(time.perf_counter() - start_time)
+    return result, samples
+
+
+def _build(builder, *args):
+    """Build a browse node and serialize it like the websocket API does."""
+    return builder(*args).as_dict()
+
+
+async def _async_timed(func, *args):
+    start_time = time.perf_counter()
+    result = await func(*args)
+    return result, time.perf_counter() - start_time
+
+
+class Bench:
+    """Fake boxes, coordinators and entities for one benchmark configuration."""
+
+    def __init__(self, args, services):
+        self._args = args
+        self._services = services
+        self._runners = []
+        self._coordinators = []
+        self._config_dir = None
+        self.boxes = []
+        self.ports = []
+        self.hass = None
+        self.scheduler = None
+        self.session = None
+
+    async def __aenter__(self):
+        self._config_dir = tempfile.TemporaryDirectory()
+        self.hass = HomeAssistant(self._config_dir.name)
+        self.hass.config_entries = config_entries.ConfigEntries(self.hass, {})
+        self.scheduler = PollScheduler(self.hass)
+        self.session = aiohttp.ClientSession()
+        for n in range(max(self._args.boxes)):
+            box = FakeBox(
+                self._args.bouquets,
+                self._services,
+                self._args.latency,
+                self._args.failure_rate,
+                mac=f"00:09:34:00:{n // 256:02x}:{n % 256:02x}",
+            )
+            runner, port = await start(box)
+            self._runners.append(runner)
+            self.boxes.append(box)
+            self.ports.append(port)
+        return self
+
+    async def __aexit__(self, *exc):
+        for coordinator in list(self._coordinators):
+            await self._async_release(coordinator)
+        await self.hass.async_block_till_done()
+        await self.session.close()
+        for runner in self._runners:
+            await runner.cleanup()
+        await self.hass.async_stop(force=True)
+        self._config_dir.cleanup()
+
+    def entry(self, n=0):
+        """Return a config entry for box ``n``.
+
+        The arguments of ``ConfigEntry`` change between Home Assistant
+        releases, the ones the installed release doesn't know are left out.
+        """
+        kwargs = {
+            "data": {CONF_HOST: "127.0.0.1", CONF_NAME: f"bench {n}"},
+            "discovery_keys": MappingProxyType({}),
+            "domain": DOMAIN,
+            "minor_version": 1,
+            "options": {},
+            "source": config_entries.SOURCE_USER,
+            "subentries_data": None,
+            "title": f"bench {n}",
+            "unique_id": None,
+            "version": 1,
+        }
+        accepted = inspect.signature(config_entries.ConfigEntry).parameters
+        return config_entries.ConfigEntry(
+            **{key: value for key, value in kwargs.items() if key in accepted}
+        )
+
+    def coordinator(self, n=0, entry=None):
+        client = DreamboxClient(
+            self.session,
+            host="127.0.0.1",
+            port=self.ports[n],
+            piconpath="/picon/",
+            executor=self.hass.async_add_executor_job,
+        )
+        coordinator = DreamboxDataUpdateCoordinator(
+            self.hass, entry or self.entry(n), client, self.scheduler
+        )
+        self._coordinators.append(coordinator)
+        return coordinator
+
+    async def _async_release(self, coordinator):
+        """Shut down ``coordinator`` so it doesn't weigh on later samples."""
+        coordinator.epg.async_shutdown()
+        await coordinator.async_shutdown()
+        self._coordinators.remove(coordinator)
+
+    async def async_setup_cold(self, coordinator):
+        assert not await coordinator.async_restore()
+        await coordinator.async_refresh()
+        assert coordinator.last_update_success, coordinator.last_exception
+
+    async def async_setup_cached(self, coordinator):
+        assert await coordinator.async_restore()
+
+    async def async_run(self):
+        results = {}
+        repeat = self._args.repeat
+
+        samples = []
+        for _ in range(repeat):
+            coordinator = self.coordinator()
+            _, elapsed = await _async_timed(self.async_setup_cold, coordinator)
+            samples.append(elapsed)
+            await self._async_release(coordinator)
+        results["setup_cold"] = _summary(samples)
+
+        reference = self.coordinator()
+        await self.async_setup_cold(reference)
+        entry = self.entry()
+        await Store(self.hass, STORAGE_VERSION, storage_key(entry.entry_id)).async_save(
+            reference.api.snapshot()
+        )
+        samples = []
+        for _ in range(repeat):
+            coordinator = self.coordinator(entry=entry)
+            _, elapsed = await _async_timed(self.async_setup_cached, coordinator)
+            samples.append(elapsed)
+            await self._async_release(coordinator)
+        results["setup_cached"] = _summary(samples)
+
+        results["update"] = {}
+        for count in self._args.boxes:
+            results["update"][str(count)] = await self._async_update(count)
+
+        client = reference.api
+        results["browse"] = self._browse(reference)
+        results["play_media"] = self._play_media(client)
+        results["search"] = self._search(client)
+        results["health"] = await self._async_health(client)
+        results["keys"] = await self._async_keys(client)
+        results["timers"] = await self._async_timers(client)
+        results["requests"] = client.stats.as_dict()
+        return results
+
+    async def _async_update(self, count):
+        coordinators = [self.coordinator(n) for n in range(count)]
+        await asyncio.gather(*(self.async_setup_cold(c) for c in coordinators))
+        samples = []
+        start_time = time.perf_counter()
+        for _ in range(self._args.repeat):
+            cycle = await asyncio.gather(
+                *(_async_timed(c.async_refresh) for c in coordinators)
+            )
+            samples.extend(elapsed for _, elapsed in cycle)
+        total = time.perf_counter() - start_time
+        result = _summary(samples)
+        result["polls_per_second"] = len(samples) / total if total else None
+        result["unavailable"] = sum(not c.last_update_success for c in coordinators)
+        return result
+
+    async def _async_health(self, client):
+        """Time fetching every health group, as if all were due at once."""
+        samples = []
+        for _ in range(self._args.repeat):
+            monitor = HealthMonitor(client)
+            for group in HEALTH_INTERVALS:
+                monitor.async_subscribe(group)
+            fetched, elapsed = await _async_timed(monitor.async_update)
+            assert len(fetched) == len(HEALTH_INTERVALS)
+            samples.append(elapsed)
+        return _summary(samples)
+
+    async def _async_timers(self, client):
+        """Time a first and a repeated sync of ``TIMER_PLAN`` timers."""
+        services = client.index.playable(client.bouquet.ref)
+        start = int(time.time()) + 24 * 60 * 60
+        plan = [
+            Timer(
+                services[n % len(services)].ref,
+                start + n * 3600,
+                start + n * 3600 + 1800,
+                name=f"Show {n}",
+            )
+            for n in range(TIMER_PLAN)
+        ]
+        results = {}
+        for phase in ("initial", "repeated"):
+            samples = []
+            for _ in range(self._args.repeat):
+                box = self.boxes[0]
+                if phase == "initial":
+                    box.timers.clear()
+                cache = TimerCache(client)
+                (sync, errors), elapsed = await _async_timed(cache.async_sync, plan)
+                assert not errors, errors
+                samples.append(elapsed)
+            results[phase] = _summary(samples)
+            results[phase]["requests"] = len(sync.add + sync.change + sync.delete)
+        return results
+
+    async def _async_keys(self, client):
+        """Time a menu navigation sequence of ``KEY_SEQUENCE`` keys."""
+        samples = []
+        for _ in range(self._args.repeat):
+            sent, elapsed = await _async_timed(client.async_send_keys, KEY_SEQUENCE)
+            assert sent == len(KEY_SEQUENCE)
+            samples.append(elapsed)
+        result = _summary(samples)
+        result["keys"] = len(KEY_SEQUENCE)
+        return result
+
+    def _browse(self, coordinator):
+        client = coordinator.api
+        device = DreamboxDevice(coordinator.name, coordinator)
+        device.entity_id = "media_player.bench"
+        bouquet = max(client.bouquets, key=lambda b: len(b.services))
+        bucket = next(iter(client.index.buckets(bouquet.ref)))
+        builders = {
+            "library": (device._build_library,),
+            "bouquet": (device._build_bouquet, bouquet),
+            "page": (device._build_page, bouquet, bucket, 0),
+        }
+        result = {}
+        for name, (builder, *args) in builders.items():
+            node, samples = _timed(_build, builder, *args, repeat=self._args.repeat)
+            result[name] = _summary(samples)
+            result[name]["children"] = len(node["children"])
+        return result
+
+    def _play_media(self, client):
+        services = [s for b in client.bouquets for s in b.services]
+        last = services[-1]
+        preferred = [client.bouquet.ref]
+        lookups = {
+            "by_ref": last.ref,
+            "by_name": last.name.upper(),
+            "miss": "No such channel",
+        }
+        result = {}
+        for name, media_id in lookups.items():
+            _, samples = _timed(
+                client.index.resolve, media_id, preferred, repeat=self._args.repeat
+            )
+            result[name] = _summary(samples)
+        return result
+
+    def _search(self, client):
+        result = {}
+        for name, query in {"prefix": "ch", "substring": "nnel 1-1"}.items():
+            _, samples = _timed(
+                client.index.search, query, None, 50, repeat=self._args.repeat
+            )
+            result[name] = _summary(samples)
+        return result
+
+
+async def async_main(args):
+    report = {
+        "python": platform.python_version(),
+        "latency": args.latency,
+        "failure_rate": args.failure_rate,
+        "bouquets": args.bouquets,
+        "results": {},
+    }
+    for services in args.services:
+        async with Bench(args, services) as bench:
+            report["results"][str(services)] = await bench.async_run()
+    return report
+
+
+def _counts(value):
+    return [int(count) for count in value.split(",")]
+
+
+def _limit(value):
+    phase, _, limit = value.partition("=")
+    return phase, float(limit)
+
+
+def _exceeded(report, limits):
+    """Return the phases whose p95 is above their limit."""
+    failures = []
+    for services, results in report["results"].items():
+        for phase, limit in limits.items():
+            result = results
+            for key in phase.split("."):
+                result = result.get(key) if isinstance(result, dict) else None
+            if not result or "p95_ms" not in result:
+                continue
+            if result["p95_ms"] > limit:
+                failures.append(
+                    f"{phase} with {services} services: "
+                    f"p95 {result['p95_ms']:.2f} ms > {limit:g} ms"
+                )
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--services",
+        type=_counts,
+        default=[10, 100, 1000, 10000],
+        help="comma separated services per bouquet",
+    )
+    parser.add_argument(
+        "--boxes",
+        type=_counts,
+        default=[1, 10, 50],
+        help="comma separated numbers of boxes polled at once",
+    )
+    parser.add_argument("--bouquets", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--output", help="write the report to a file")
+    parser.add_argument(
+        "--max-ms",
+        type=_limit,
+        action="append",
+        default=[],
+        metavar="PHASE=MS",
+        help="p95 limit of a phase in milliseconds, e.g. browse.bouquet=50",
+    )
+    args = parser.parse_args()
+
+    report = asyncio.run(async_main(args))
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as out:
+            out.write(text)
+    else:
+        sys.stdout.write(f"{text}\n")
+    failures = _exceeded(report, {**DEFAULT_MAX_MS, **dict(args.max_ms)})
+    for failure in failures:
+        sys.stderr.write(f"Too slow: {failure}\n")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
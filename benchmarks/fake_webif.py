@@ -0,0 +1,416 @@
+"""A local stand-in for the Enigma2 web interface
+
+Serves just enough of the WebIf for the dreambox integration: session,
+deviceinfo, powerstate, getcurrent, getservices, epgnow, epgnext, vol,
+zap, remotecontrol, getlocations, mediaplayerlist, movielist, signal,
+timerlist, timeradd, timerchange, timerdelete and file, including
+``/proc/loadavg`` and ``/proc/uptime``.
+Latency, failure rate and the size of the bouquet list are configurable
+so that the integration can be benchmarked without a box.
+
+    python -m benchmarks.fake_webif --port 8080 --bouquets 10 --services 1000
+"""
+import argparse
+import asyncio
+import hashlib
+import random
+import struct
+import time
+import zlib
+from xml.sax.saxutils import escape
+
+from aiohttp import web
+
+MOVIE_PATH = "/media/hdd/movie/"
+TV_BOUQUET = '1:7:1:0:0:0:0:0:0:0:FROM BOUQUET "userbouquet.{}.tv" ORDER BY bouquet'
+
+
+def _png(width=220, height=132):
+    """Return a plain grey PNG, good enough for picon transfers."""
+    raw = b"".join(b"\x00" + b"\x80" * width for _ in range(height))
+
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(raw))
+        + chunk(b"IEND", b"")
+    )
+
+
+class FakeBox:
+    """State of one simulated receiver."""
+
+    def __init__(
+        self,
+        bouquets=5,
+        services=100,
+        latency=0.0,
+        failure_rate=0.0,
+        mac="00:09:34:00:00:01",
+        recordings=50,
+    ):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.mac = mac
+        self.standby = False
+        self.volume = 50
+        self.muted = False
+        self.requests = 0
+        self.recordings = [
+            (f"{MOVIE_PATH}2024010{n % 9 + 1} - Channel - Show {n}.ts", f"Show {n}")
+            for n in range(recordings)
+        ]
+        self.bouquets = {}
+        for b in range(bouquets):
+            ref = TV_BOUQUET.format(f"fav{b}")
+            self.bouquets[ref] = (
+                f"Bouquet {b}",
+                [
+                    (
+                        f"1:0:19:{b * services + s + 1:X}:3FB:1:C00000:0:0:0:",
+                        f"Channel {b}-{s}",
+                    )
+                    for s in range(services)
+                ],
+            )
+        first = next(iter(self.bouquets.values()), ("", []))[1]
+        self.current = first[0] if first else ("", "")
+        self.picon = _png()
+        self.picon_etag = hashlib.sha1(self.picon).hexdigest()
+        self.booted = time.time()
+        self.timers = {}
+
+    def app(self):
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_route("*", "/web/session", self.session)
+        app.router.add_route("*", "/web/deviceinfo", self.deviceinfo)
+        app.router.add_route("*", "/web/powerstate", self.powerstate)
+        app.router.add_route("*", "/web/getcurrent", self.getcurrent)
+        app.router.add_route("*", "/web/getservices", self.getservices)
+        app.router.add_route("*", "/web/epgnow", self.epgnow)
+        app.router.add_route("*", "/web/epgnext", self.epgnext)
+        app.router.add_route("*", "/web/vol", self.vol)
+        app.router.add_route("*", "/web/zap", self.zap)
+        app.router.add_route("*", "/web/remotecontrol", self.remotecontrol)
+        app.router.add_route("*", "/web/getlocations", self.getlocations)
+        app.router.add_route("*", "/web/mediaplayerlist", self.mediaplayerlist)
+        app.router.add_route("*", "/web/movielist", self.movielist)
+        app.router.add_route("*", "/web/signal", self.signal)
+        app.router.add_route("*", "/web/timerlist", self.timerlist)
+        app.router.add_route("*", "/web/timeradd", self.timeradd)
+        app.router.add_route("*", "/web/timerchange", self.timerchange)
+        app.router.add_route("*", "/web/timerdelete", self.timerdelete)
+        app.router.add_get("/file", self.file)
+        return app
+
+    @web.middleware
+    async def _middleware(self, request, handler):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            request.transport.close()
+            raise web.HTTPServiceUnavailable()
+        return await handler(request)
+
+    @staticmethod
+    async def _args(request):
+        args = dict(request.query)
+        if request.method == "POST":
+            args.update(await request.post())
+        return args
+
+    @staticmethod
+    def _xml(body):
+        return web.Response(
+            text=f'<?xml version="1.0" encoding="UTF-8"?>\n{body}',
+            content_type="text/xml",
+        )
+
+    def _volume(self):
+        return (
+            "<e2volume><e2result>True</e2result><e2resulttext>ok</e2resulttext>"
+            f"<e2current>{self.volume}</e2current>"
+            f"<e2ismuted>{self.muted}</e2ismuted></e2volume>"
+        )
+
+    @staticmethod
+    def _result(state, text="ok"):
+        return (
+            f"<e2simplexmlresult><e2state>{state}</e2state>"
+            f"<e2statetext>{escape(text)}</e2statetext></e2simplexmlresult>"
+        )
+
+    async def session(self, request):
+        return self._xml("<e2sessionid>fake-session</e2sessionid>")
+
+    async def deviceinfo(self, request):
+        return self._xml(
+            "<e2deviceinfo>"
+            "<e2enigmaversion>4.4.0-fake</e2enigmaversion>"
+            "<e2imageversion>Fake 1.0</e2imageversion>"
+            "<e2webifversion>1.9.0</e2webifversion>"
+            "<e2devicename>dm920</e2devicename>"
+            "<e2network><e2interface>"
+            f"<e2name>eth0</e2name><e2mac>{self.mac}</e2mac><e2dhcp>dhcp</e2dhcp>"
+            "<e2ip>127.0.0.1</e2ip><e2gateway>127.0.0.1</e2gateway>"
+            "<e2netmask>255.0.0.0</e2netmask><e2method6>off</e2method6>"
+            "<e2ip6>::</e2ip6><e2gateway6>::</e2gateway6>"
+            "<e2netmask6>64</e2netmask6>"
+            "</e2interface></e2network>"
+            "<e2hdds><e2hdd><e2model>ATA FAKE-HDD</e2model>"
+            "<e2capacity>500.107 GB</e2capacity><e2free>219.254 GB</e2free>"
+            "</e2hdd></e2hdds>"
+            "</e2deviceinfo>"
+        )
+
+    async def powerstate(self, request):
+        state = int((await self._args(request)).get("newstate", -1))
+        if state == 0:
+            self.standby = not self.standby
+        elif state == 4:
+            self.standby = False
+        elif state == 5:
+            self.standby = True
+        return self._xml(
+            f"<e2powerstate><e2instandby>{self.standby}</e2instandby></e2powerstate>"
+        )
+
+    def _event(self, start, title, ref=""):
+        return (
+            "<e2event><e2eventid>1</e2eventid>"
+            f"<e2eventservicereference>{escape(ref)}</e2eventservicereference>"
+            f"<e2eventstart>{start}</e2eventstart>"
+            "<e2eventduration>3600</e2eventduration>"
+            f"<e2eventremaining>{start + 3600 - int(time.time())}</e2eventremaining>"
+            f"<e2eventcurrenttime>{time.time()}</e2eventcurrenttime>"
+            "<e2eventprovidername>Fake</e2eventprovidername>"
+            f"<e2eventname>{escape(title)}</e2eventname>"
+            f"<e2eventtitle>{escape(title)}</e2eventtitle>"
+            "<e2eventdescription>Description</e2eventdescription>"
+            "<e2eventdescriptionextended>More</e2eventdescriptionextended>"
+            "</e2event>"
+        )
+
+    async def getcurrent(self, request):
+        ref, name = self.current
+        start = int(time.time()) // 3600 * 3600
+        return self._xml(
+            "<e2currentserviceinformation>"
+            f"<e2service><e2servicereference>{escape(ref)}</e2servicereference>"
+            f"<e2servicename>{escape(name)}</e2servicename></e2service>"
+            "<e2eventlist>"
+            f"{self._event(start, 'Now on ' + name)}"
+            f"{self._event(start + 3600, 'Next on ' + name)}"
+            "</e2eventlist>"
+            f"{self._volume()}"
+            "</e2currentserviceinformation>"
+        )
+
+    async def getservices(self, request):
+        ref = (await self._args(request)).get("sRef", "")
+        if "bouquets.tv" in ref:
+            entries = [(r, name) for r, (name, _) in self.bouquets.items()]
+        elif ref in self.bouquets:
+            entries = self.bouquets[ref][1]
+        else:
+            entries = []
+        return self._xml(
+            "<e2servicelist>"
+            + "".join(
+                f"<e2service><e2servicereference>{escape(r)}</e2servicereference>"
+                f"<e2servicename>{escape(n)}</e2servicename></e2service>"
+                for r, n in entries
+            )
+            + "</e2servicelist>"
+        )
+
+    async def _epg(self, request, offset, prefix):
+        ref = (await self._args(request)).get("bRef", "")
+        services = self.bouquets.get(ref, ("", []))[1]
+        start = int(time.time()) // 3600 * 3600 + offset
+        return self._xml(
+            "<e2eventlist>"
+            + "".join(self._event(start, f"{prefix} on {n}", r) for r, n in services)
+            + "</e2eventlist>"
+        )
+
+    async def epgnow(self, request):
+        return await self._epg(request, 0, "Now")
+
+    async def epgnext(self, request):
+        return await self._epg(request, 3600, "Next")
+
+    async def vol(self, request):
+        action = (await self._args(request)).get("set", "")
+        if action == "up":
+            self.volume = min(100, self.volume + 5)
+        elif action == "down":
+            self.volume = max(0, self.volume - 5)
+        elif action == "mute":
+            self.muted = not self.muted
+        elif action.startswith("set"):
+            self.volume = int(action[3:])
+        return self._xml(self._volume())
+
+    async def zap(self, request):
+        ref = (await self._args(request)).get("sRef", "")
+        for filename, title in self.recordings:
+            if ref.endswith(f":{filename}"):
+                self.current = (ref, title)
+                return self._xml(self._result(True, f"Active service is {ref}"))
+        for _, services in self.bouquets.values():
+            for service in services:
+                if service[0] == ref:
+                    self.current = service
+                    return self._xml(self._result(True, f"Active service is {ref}"))
+        return self._xml(self._result(False, "Service not found"))
+
+    async def getlocations(self, request):
+        return self._xml(
+            f"<e2locations><e2location>{MOVIE_PATH}</e2location></e2locations>"
+        )
+
+    async def mediaplayerlist(self, request):
+        path = (await self._args(request)).get("path", "")
+        files = self.recordings if path == MOVIE_PATH else []
+        return self._xml(
+            "<e2filelist>"
+            "<e2file><e2servicereference>/media/hdd/</e2servicereference>"
+            "<e2isdirectory>True</e2isdirectory><e2root>/media/hdd/</e2root></e2file>"
+            + "".join(
+                f"<e2file><e2servicereference>4097:0:0:0:0:0:0:0:0:0:{escape(f)}"
+                "</e2servicereference><e2isdirectory>False</e2isdirectory>"
+                f"<e2root>{escape(path)}</e2root></e2file>"
+                for f, _ in files
+            )
+            + "</e2filelist>"
+        )
+
+    async def movielist(self, request):
+        path = (await self._args(request)).get("dirname", "")
+        files = self.recordings if path == MOVIE_PATH else []
+        return self._xml(
+            "<e2movielist>"
+            + "".join(
+                "<e2movie><e2servicereference>1:0:0:0:0:0:0:0:0:0:"
+                f"{escape(f)}</e2servicereference><e2title>{escape(t)}</e2title>"
+                f"<e2description>{escape(t)}</e2description>"
+                f"<e2time>{1704067200 + n * 3600}</e2time><e2length>45:00</e2length>"
+                f"<e2filename>{escape(f)}</e2filename></e2movie>"
+                for n, (f, t) in enumerate(files)
+            )
+            + "</e2movielist>"
+        )
+
+    async def remotecontrol(self, request):
+        return self._xml(self._result(True, "RC command sent"))
+
+    async def signal(self, request):
+        return self._xml(
+            "<e2frontendstatus>"
+            "<e2snrdb>12.45 dB</e2snrdb><e2snr>79 %</e2snr>"
+            "<e2ber>0</e2ber><e2acg>92 %</e2acg>"
+            f"<e2lock>{not self.standby}</e2lock>"
+            "</e2frontendstatus>"
+        )
+
+    async def timerlist(self, request):
+        timers = "".join(
+            "<e2timer>"
+            f"<e2servicereference>{escape(ref)}</e2servicereference>"
+            f"<e2timebegin>{begin}</e2timebegin><e2timeend>{end}</e2timeend>"
+            f"<e2name>{escape(timer['name'])}</e2name>"
+            f"<e2description>{escape(timer['description'])}</e2description>"
+            f"<e2disabled>{timer['disabled']}</e2disabled>"
+            f"<e2justplay>{timer['justplay']}</e2justplay>"
+            f"<e2afterevent>{timer['afterevent']}</e2afterevent>"
+            "<e2repeated>0</e2repeated><e2state>0</e2state>"
+            "</e2timer>"
+            for (ref, begin, end), timer in sorted(self.timers.items())
+        )
+        return self._xml(f"<e2timerlist>{timers}</e2timerlist>")
+
+    @staticmethod
+    def _timer(args):
+        key = (args.get("sRef", ""), int(args["begin"]), int(args["end"]))
+        return key, {
+            "name": args.get("name", ""),
+            "description": args.get("description", ""),
+            "disabled": int(args.get("disabled", 0)),
+            "justplay": int(args.get("justplay", 0)),
+            "afterevent": int(args.get("afterevent", 3)),
+        }
+
+    async def timeradd(self, request):
+        key, timer = self._timer(await self._args(request))
+        if key in self.timers:
+            return self._xml(self._result(False, "Conflicting timer"))
+        self.timers[key] = timer
+        return self._xml(self._result(True, "Timer added"))
+
+    async def timerchange(self, request):
+        args = await self._args(request)
+        old = (args.get("channelOld", ""), int(args["beginOld"]), int(args["endOld"]))
+        if self.timers.pop(old, None) is None:
+            return self._xml(self._result(False, "No such timer"))
+        key, timer = self._timer(args)
+        self.timers[key] = timer
+        return self._xml(self._result(True, "Timer changed"))
+
+    async def timerdelete(self, request):
+        key, _ = self._timer(await self._args(request))
+        if self.timers.pop(key, None) is None:
+            return self._xml(self._result(False, "No such timer"))
+        return self._xml(self._result(True, "Timer deleted"))
+
+    async def file(self, request):
+        path = request.query.get("file", "")
+        if path == "/proc/loadavg":
+            return web.Response(text="0.42 0.35 0.30 1/180 4242\n")
+        if path == "/proc/uptime":
+            uptime = time.time() - self.booted
+            return web.Response(text=f"{uptime:.2f} {uptime * 1.8:.2f}\n")
+        if request.headers.get("If-None-Match") == self.picon_etag:
+            return web.Response(status=304)
+        return web.Response(
+            body=self.picon,
+            content_type="image/png",
+            headers={"ETag": self.picon_etag},
+        )
+
+
+async def start(box, host="127.0.0.1", port=0):
+    """Serve a fake box, returns the runner and the bound port."""
+    runner = web.AppRunner(box.app(), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    return runner, site._server.sockets[0].getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--bouquets", type=int, default=5)
+    parser.add_argument("--services", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    box = FakeBox(
+        args.bouquets,
+        args.services,
+        args.latency,
+        args.failure_rate,
+    )
+    web.run_app(box.app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 """The Dreambox integration."""
 import asyncio
+import shutil
 
-from dreamboxapi.api import DreamboxApi
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import (
     CONF_DEVICES,
@@ -13,14 +13,44 @@ from homeassistant.const import (
     CONF_USERNAME,
 )
 from homeassistant.core import HomeAssistant, callback
-from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.storage import Store
 
-from .const import CONF_CONNECTIONS, DEFAULT_PICON_PATH, DOMAIN, PLATFORMS
+from .client import DreamboxClient
+from .const import (
+    CONF_CONNECTIONS,
+    CONF_COORDINATORS,
+    CONF_PENDING,
+    CONF_SCHEDULER,
+    DEFAULT_PICON_PATH,
+    DOMAIN,
+    PLATFORMS,
+    STORAGE_VERSION,
+)
+from .coordinator import (
+    DreamboxDataUpdateCoordinator,
+    picon_cache_path,
+    storage_key,
+)
+from .scheduler import PollScheduler
+from .services import async_setup_services
+from .stream import DreamboxStreamView
 
 
 async def async_setup(hass: HomeAssistant, config: dict):
     """Set up the Dreambox component."""
-    hass.data.setdefault(DOMAIN, {CONF_CONNECTIONS: {}, CONF_DEVICES: set()})
+    hass.data.setdefault(
+        DOMAIN,
+        {
+            CONF_CONNECTIONS: {},
+            CONF_COORDINATORS: {},
+            CONF_DEVICES: set(),
+            CONF_PENDING: {},
+            CONF_SCHEDULER: PollScheduler(hass),
+        },
+    )
+    hass.http.register_view(DreamboxStreamView(hass))
+    async_setup_services(hass)
     if DOMAIN in config:
         for entry_config in config[DOMAIN][CONF_DEVICES]:
             hass.async_create_task(
@@ -40,20 +70,34 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     password = entry.data[CONF_PASSWORD]
     piconpath = entry.options[CONF_PATH]
     ssl = entry.data[CONF_SSL]
-    api = DreamboxApi(
+    api = DreamboxClient(
+        async_get_clientsession(hass, verify_ssl=False),
         host=host,
         port=port,
         user=username,
         password=password,
         https=ssl,
         piconpath=piconpath,
+        executor=hass.async_add_executor_job,
     )
-    await hass.async_add_executor_job(api.get_deviceinfo)
-    if api.deviceinfo is None:
-        raise ConfigEntryNotReady("Failed to obtain device information")
+    scheduler = hass.data[DOMAIN][CONF_SCHEDULER]
+    coordinator = DreamboxDataUpdateCoordinator(hass, entry, api, scheduler)
+    entry.async_on_unload(coordinator.epg.async_shutdown)
+    # device information the config flow just fetched, if any
+    validated = hass.data[DOMAIN][CONF_PENDING].pop(host, None)
+    if await coordinator.async_restore(validated):
+        # known box, finish setup from the cache and catch up in the background
+        entry.async_create_background_task(
+            hass, coordinator.async_refresh(), f"{DOMAIN} {entry.title} refresh"
+        )
+    else:
+        await coordinator.async_config_entry_first_refresh()
 
     hass.data[DOMAIN][CONF_CONNECTIONS][entry.entry_id] = api
+    hass.data[DOMAIN][CONF_COORDINATORS][entry.entry_id] = coordinator
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    # only boxes that are set up take a poll phase, a failed setup never unloads
+    scheduler.register(entry.entry_id)
 
     return True
 
@@ -71,5 +115,15 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     if unload_ok:
         hass.data[DOMAIN][CONF_CONNECTIONS].pop(entry.entry_id)
+        hass.data[DOMAIN][CONF_COORDINATORS].pop(entry.entry_id)
+        hass.data[DOMAIN][CONF_SCHEDULER].unregister(entry.entry_id)
 
     return unload_ok
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry):
+    """Remove the cached box data of a deleted config entry."""
+    await Store(hass, STORAGE_VERSION, storage_key(entry.entry_id)).async_remove()
+    await hass.async_add_executor_job(
+        shutil.rmtree, picon_cache_path(hass, entry.entry_id), True
+    )
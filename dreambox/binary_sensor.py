@@ -0,0 +1,25 @@
+"""Binary sensors for dreamboxes"""
+from homeassistant.components.binary_sensor import BinarySensorEntity
+from homeassistant.const import CONF_NAME, EntityCategory
+
+from .const import CONF_COORDINATORS, DOMAIN
+from .health import GROUP_SIGNAL, HealthEntity
+
+
+async def async_setup_entry(hass, config_entry, async_add_entities):
+    coordinator = hass.data[DOMAIN][CONF_COORDINATORS][config_entry.entry_id]
+    async_add_entities([TunerLockSensor(config_entry.data[CONF_NAME], coordinator)])
+
+
+class TunerLockSensor(HealthEntity, BinarySensorEntity):
+    """Whether the tuner in use is locked to its transponder."""
+
+    group = GROUP_SIGNAL
+    key = "lock"
+    label = "tuner lock"
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_icon = "mdi:satellite-uplink"
+
+    @property
+    def is_on(self):
+        return self._value
@@ -0,0 +1,215 @@
+"""Lookup tables over the bouquet list of a dreambox"""
+import bisect
+import hashlib
+import unicodedata
+from collections import OrderedDict
+
+BUCKET_DIGITS = "0-9"
+BUCKET_OTHER = "#"
+
+
+def content_hash(raw):
+    """Return a hash identifying the raw bouquet list responses."""
+    digest = hashlib.sha1()
+    for text in raw["lists"]:
+        digest.update(text.encode())
+    for ref, text in raw["services"].items():
+        digest.update(ref.encode())
+        digest.update((text or "").encode())
+    return digest.hexdigest()
+
+
+def normalize_name(name):
+    """Reduce a channel name to a case and accent insensitive lookup key."""
+    name = unicodedata.normalize("NFKD", name)
+    return "".join(c for c in name.casefold() if c.isalnum())
+
+
+def bucket_of(name):
+    """Return the A-Z bucket a channel name is sorted into."""
+    key = normalize_name(name)
+    if not key:
+        return BUCKET_OTHER
+    first = key[0]
+    if first.isdigit():
+        return BUCKET_DIGITS
+    if "a" <= first <= "z":
+        return first.upper()
+    return BUCKET_OTHER
+
+
+def _trigrams(key):
+    return {key[i : i + 3] for i in range(len(key) - 2)}
+
+
+class NameSearch:
+    """Prefix and trigram index over the names of some services.
+
+    Queries shorter than three characters are matched as prefixes using
+    a sorted key list, longer ones as substrings of the candidates that
+    share all trigrams with the query.
+    """
+
+    def __init__(self, services):
+        self._services = []
+        self._keys = []
+        self._trigrams = {}
+        seen = set()
+        for service in services:
+            if service.ref in seen or not is_playable(service.ref):
+                continue
+            seen.add(service.ref)
+            key = normalize_name(service.name)
+            position = len(self._services)
+            self._services.append(service)
+            self._keys.append(key)
+            for trigram in _trigrams(key):
+                self._trigrams.setdefault(trigram, []).append(position)
+        self._sorted = sorted((key, i) for i, key in enumerate(self._keys))
+
+    def search(self, query, limit):
+        """Return up to ``limit`` services, exact and prefix matches first."""
+        query = normalize_name(query)
+        if not query:
+            return []
+        if len(query) < 3:
+            start = bisect.bisect_left(self._sorted, (query,))
+            matches = []
+            for key, position in self._sorted[start:]:
+                if not key.startswith(query) or len(matches) >= limit:
+                    break
+                matches.append(position)
+            return [self._services[i] for i in sorted(matches)]
+        postings = sorted(
+            (self._trigrams.get(t, []) for t in _trigrams(query)), key=len
+        )
+        candidates = set(postings[0]).intersection(*postings[1:])
+        matches = [i for i in candidates if query in self._keys[i]]
+        matches.sort(
+            key=lambda i: (
+                self._keys[i] != query,
+                not self._keys[i].startswith(query),
+                i,
+            )
+        )
+        return [self._services[i] for i in matches[:limit]]
+
+
+def is_playable(ref):
+    """Return whether a service reference can be zapped to.
+
+    Markers and nested bouquets are part of bouquets but cannot be played.
+    """
+    return not ref.startswith(("1:64:", "1:7:"))
+
+
+class BouquetIndex:
+    """Indexes for one revision of a bouquet list.
+
+    Built once whenever the bouquet list changes so that lookups by
+    service or bouquet reference do not have to scan all bouquets.
+    """
+
+    def __init__(self, bouquets, revision):
+        self.revision = revision
+        self._bouquets = {}
+        self._services = {}
+        self._containers = {}
+        self._names = {}
+        self._playable = {}
+        self._positions = {}
+        self._buckets = {}
+        self._search = {}
+        for bouquet in bouquets:
+            self._bouquets[bouquet.ref] = bouquet
+            playable = [s for s in bouquet.services if is_playable(s.ref)]
+            self._playable[bouquet.ref] = playable
+            # markers and sub-bouquets must not claim a name or a reference
+            for position, service in enumerate(playable):
+                self._positions.setdefault((bouquet.ref, service.ref), position)
+                self._services.setdefault(service.ref, service)
+                self._containers.setdefault(service.ref, []).append(bouquet)
+                self._names.setdefault(normalize_name(service.name), service.ref)
+
+    def prepare(self):
+        """Build the search and A-Z indexes of all bouquets up front.
+
+        They are otherwise built on first use, which for large bouquet
+        lists is too slow to happen on the event loop.
+        """
+        self.search("", None)
+        for ref in self._bouquets:
+            self.search("", ref)
+            self.buckets(ref)
+        return self
+
+    def bouquet(self, ref):
+        """Return the bouquet with the given reference."""
+        return self._bouquets.get(ref)
+
+    def service(self, ref):
+        """Return the service with the given reference."""
+        return self._services.get(ref)
+
+    def bouquets_for(self, ref):
+        """Return all bouquets containing the given service."""
+        return self._containers.get(ref, [])
+
+    def playable(self, ref):
+        """Return the playable services of a bouquet."""
+        return self._playable.get(ref, [])
+
+    def position(self, bouquet_ref, ref):
+        """Return the position of a service among the playable services."""
+        return self._positions.get((bouquet_ref, ref))
+
+    def buckets(self, ref):
+        """Return the playable services of a bouquet by A-Z bucket.
+
+        Built once per bouquet list revision, by ``prepare`` or on first use.
+        """
+        buckets = self._buckets.get(ref)
+        if buckets is None:
+            buckets = {}
+            for service in self.playable(ref):
+                buckets.setdefault(bucket_of(service.name), []).append(service)
+            buckets = self._buckets[ref] = OrderedDict(
+                (key, buckets[key])
+                for key in sorted(
+                    buckets, key=lambda k: (k == BUCKET_OTHER, k == BUCKET_DIGITS, k)
+                )
+            )
+        return buckets
+
+    def search(self, query, bouquet_ref=None, limit=50):
+        """Return the services matching a name, optionally in one bouquet."""
+        search = self._search.get(bouquet_ref)
+        if search is None:
+            if bouquet_ref is None:
+                services = self._services.values()
+            else:
+                services = self.playable(bouquet_ref)
+            search = self._search[bouquet_ref] = NameSearch(services)
+        return search.search(query, limit)
+
+    def resolve(self, media_id, bouquet_refs=()):
+        """Return the service and bouquet to play for a reference or name.
+
+        The first of ``bouquet_refs`` containing the service is used as
+        bouquet context, otherwise the first bouquet containing it.
+        """
+        service = self._services.get(media_id)
+        if service is None:
+            ref = self._names.get(normalize_name(media_id))
+            if ref is None:
+                return None, None
+            service = self._services[ref]
+        containers = self._containers[service.ref]
+        for ref in bouquet_refs:
+            for bouquet in containers:
+                if bouquet.ref == ref:
+                    return service, bouquet
+        return service, containers[0]
+
+
+EMPTY_INDEX = BouquetIndex([], None)
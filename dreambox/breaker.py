@@ -0,0 +1,101 @@
+"""Circuit breaker for unreachable dreamboxes"""
+import asyncio
+import logging
+import random
+import time
+from contextlib import suppress
+
+_LOGGER = logging.getLogger(__name__)
+
+FAILURE_THRESHOLD = 3
+PROBE_TIMEOUT = 2
+RETRY_DELAY = 5
+MAX_RETRY_DELAY = 300
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class BoxUnavailable(Exception):
+    """The box is known to be unreachable, the request was not sent."""
+
+
+class CircuitBreaker:
+    """Fail fast while a box is unreachable.
+
+    After ``FAILURE_THRESHOLD`` consecutive connection failures the
+    breaker opens and requests are refused immediately. Once the jittered,
+    exponentially growing retry delay has passed a plain TCP connect probes
+    the box before real requests are let through again.
+    """
+
+    def __init__(self, host, port):
+        self._host = host
+        self._port = port
+        self._failures = 0
+        self._opened = 0
+        self._retry_at = 0.0
+        self._probe_lock = asyncio.Lock()
+        self.state = STATE_CLOSED
+
+    @property
+    def failures(self):
+        return self._failures
+
+    @property
+    def retry_in(self):
+        """Seconds until the next probe, ``None`` unless open."""
+        if self.state != STATE_OPEN:
+            return None
+        return max(0.0, self._retry_at - time.monotonic())
+
+    async def async_check(self):
+        """Raise ``BoxUnavailable`` unless a request may be sent."""
+        if self.state == STATE_CLOSED:
+            return
+        async with self._probe_lock:
+            if self.state == STATE_HALF_OPEN:
+                return
+            if time.monotonic() < self._retry_at:
+                raise BoxUnavailable(f"{self._host} is unreachable")
+            if not await self._async_probe():
+                self._open()
+                raise BoxUnavailable(f"{self._host} is unreachable")
+            _LOGGER.debug(f"{self._host} is reachable again, half-opening breaker")
+            self.state = STATE_HALF_OPEN
+
+    def record_success(self):
+        if self.state != STATE_CLOSED:
+            _LOGGER.info(f"{self._host} is back online")
+        self._failures = 0
+        self._opened = 0
+        self.state = STATE_CLOSED
+
+    def record_failure(self):
+        self._failures += 1
+        if self.state == STATE_HALF_OPEN or self._failures >= FAILURE_THRESHOLD:
+            self._open()
+
+    def _open(self):
+        if self.state == STATE_CLOSED:
+            _LOGGER.warning(
+                f"{self._host} failed {self._failures} times in a row, "
+                "refusing requests until it is reachable again"
+            )
+        self._opened += 1
+        delay = min(MAX_RETRY_DELAY, RETRY_DELAY * 2 ** (self._opened - 1))
+        self._retry_at = time.monotonic() + delay * random.uniform(0.5, 1.0)
+        self.state = STATE_OPEN
+
+    async def _async_probe(self):
+        try:
+            _, writer = await asyncio.wait_for(
+                asyncio.open_connection(self._host, self._port), PROBE_TIMEOUT
+            )
+        except (OSError, asyncio.TimeoutError):
+            return False
+        writer.close()
+        with suppress(OSError):
+            await writer.wait_closed()
+        return True
@@ -0,0 +1,646 @@
+"""Asynchronous client for the Enigma2 web interface"""
+import asyncio
+import logging
+import time
+import xml.etree.ElementTree as ET
+from contextlib import asynccontextmanager
+from urllib.parse import quote, urlencode
+
+import aiohttp
+from aiohttp import hdrs
+from dreamboxapi.api import DreamboxApi
+from dreamboxapi.data import DeviceInfo, Service, ServiceList, SimpleResult, Volume
+
+from .bouquets import EMPTY_INDEX, BouquetIndex, content_hash
+from .breaker import BoxUnavailable, CircuitBreaker
+from .epg import parse_events
+from .health import parse_hdds, parse_signal
+from .recordings import parse_directory, parse_movies, recording_ref
+from .stats import (
+    CAUSE_AUTH,
+    CAUSE_CONNECTION,
+    CAUSE_PARSE,
+    CAUSE_TIMEOUT,
+    CAUSE_UNAVAILABLE,
+    RequestStats,
+    http_cause,
+)
+from .timers import AFTER_EVENT_AUTO
+
+_LOGGER = logging.getLogger(__name__)
+
+MAX_CONNECTIONS_PER_HOST = 2
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=10)
+STREAM_PORT = 8001
+STREAM_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=30)
+
+URL_EPG_NOW = "/web/epgnow"
+URL_EPG_NEXT = "/web/epgnext"
+URL_LOCATIONS = "/web/getlocations"
+URL_MEDIAPLAYERLIST = "/web/mediaplayerlist"
+URL_MOVIELIST = "/web/movielist"
+URL_SIGNAL = "/web/signal"
+URL_TIMERADD = "/web/timeradd"
+URL_TIMERCHANGE = "/web/timerchange"
+URL_TIMERDELETE = "/web/timerdelete"
+URL_TIMERLIST = "/web/timerlist"
+URL_STREAM = "stream"
+
+KEY_CHANNEL_UP = 402
+KEY_CHANNEL_DOWN = 403
+
+
+def _failure_cause(error):
+    if isinstance(error, asyncio.TimeoutError):
+        return CAUSE_TIMEOUT
+    return CAUSE_CONNECTION
+
+
+class AuthenticationFailed(Exception):
+    """The box rejected the configured credentials."""
+
+
+class DreamboxClient:
+    """Talk to the web interface of a single Enigma2 box.
+
+    Mirrors the surface of ``dreamboxapi.api.DreamboxApi`` but runs on a
+    shared aiohttp session so that no executor threads are held while
+    waiting for the box. At most ``MAX_CONNECTIONS_PER_HOST`` requests
+    are in flight per box, the underlying keep-alive connections are
+    reused between requests. Requests to a box that keeps failing are
+    refused with ``BoxUnavailable`` by a circuit breaker.
+    """
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        host,
+        port=80,
+        user=None,
+        password=None,
+        https=False,
+        bouquet=None,
+        piconpath=None,
+        timeout=REQUEST_TIMEOUT,
+        executor=None,
+    ):
+        if not host:
+            raise ValueError("Host not set!")
+        self._session = session
+        self._host = host
+        self._port = port
+        self._auth = aiohttp.BasicAuth(user, password or "") if user else None
+        self._defaultBouquet = bouquet
+        self._piconPath = piconpath
+        protocol = "https" if https else "http"
+        self._baseUrl = f"{protocol}://{host}:{port}"
+        self._timeout = timeout
+        self._executor = executor
+        self._semaphore = asyncio.Semaphore(MAX_CONNECTIONS_PER_HOST)
+        self._breaker = CircuitBreaker(host, port)
+        self._stats = RequestStats()
+
+        self._sessionid = None
+        self._available = False
+        self._instandby = True
+        self._current = None
+        self._volume = None
+        self._deviceinfo = None
+        self._deviceinfo_xml = None
+        self._bouquet = None
+        self._bouquets = []
+        self._bouquets_xml = None
+        self._index = EMPTY_INDEX
+
+    @property
+    def host(self):
+        return self._host
+
+    @property
+    def breaker(self):
+        return self._breaker
+
+    @property
+    def stats(self):
+        return self._stats
+
+    @property
+    def available(self):
+        return self._available
+
+    @property
+    def standby(self):
+        return self._instandby
+
+    @property
+    def current(self):
+        return self._current
+
+    @property
+    def bouquets(self):
+        return self._bouquets
+
+    @property
+    def bouquet(self):
+        return self._bouquet
+
+    @property
+    def index(self):
+        return self._index
+
+    @property
+    def deviceinfo(self):
+        return self._deviceinfo
+
+    @property
+    def mac(self):
+        if self.deviceinfo:
+            for nic in self.deviceinfo.interfaces:
+                if nic.mac.startswith("00:09:34"):
+                    return nic.mac
+            if len(self.deviceinfo.interfaces):
+                return self.deviceinfo.interfaces[0].mac
+        return ""
+
+    @property
+    def muted(self):
+        if not self._volume:
+            return None
+        return self._volume.muted
+
+    @property
+    def volume(self):
+        if not self._volume:
+            return 0
+        return self._volume.volume
+
+    def picon_path(self, service=None):
+        if not self._piconPath:
+            return None
+        if service is None:
+            service = self._current
+        if service is None or not service.picon:
+            return None
+        return f"{self._piconPath}/{service.picon}"
+
+    def picon(self, service=None):
+        path = self.picon_path(service)
+        if path is None:
+            return None
+        return self.file_url(path)
+
+    def file_url(self, path):
+        args = urlencode({"file": path})
+        return f"{self._url(DreamboxApi.URL_FILE)}?{args}"
+
+    def stream_url(self, ref):
+        return f"http://{self._host}:{STREAM_PORT}/{quote(ref, safe=':/')}"
+
+    @asynccontextmanager
+    async def async_open_stream(self, ref):
+        """Open the transport stream of a service or recording.
+
+        Streams are not subject to the per box connection limit, they are
+        held open for as long as somebody is watching.
+        """
+        await self._breaker.async_check()
+        started = time.perf_counter()
+        try:
+            response = await self._session.get(
+                self.stream_url(ref), auth=self._auth, timeout=STREAM_TIMEOUT
+            )
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self._stats.record(URL_STREAM, None, _failure_cause(e))
+            raise
+        self._stats.record(URL_STREAM, time.perf_counter() - started)
+        try:
+            yield response
+        finally:
+            # live streams never end, drop the connection instead of draining it
+            response.close()
+
+    def _url(self, path):
+        return f"{self._baseUrl}{path}"
+
+    async def _post(self, path, data):
+        if self._sessionid is not None:
+            data = {**data, "sessionid": self._sessionid}
+        async with self._semaphore:
+            async with self._session.post(
+                self._url(path), data=data, auth=self._auth, timeout=self._timeout
+            ) as response:
+                return response.status, await response.text()
+
+    async def _request(self, path, data=None):
+        try:
+            await self._breaker.async_check()
+        except BoxUnavailable:
+            self._available = False
+            self._stats.record(path, None, CAUSE_UNAVAILABLE)
+            raise
+        data = data or {}
+        started = time.perf_counter()
+        try:
+            status, text = await self._post(path, data)
+            if status == 412:  # precondition failed, session invalid
+                _LOGGER.debug("Precondition Failed - Acquiring new session")
+                await self.async_get_session()
+                if self._sessionid:
+                    status, text = await self._post(path, data)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self._available = False
+            self._breaker.record_failure()
+            self._stats.record(path, None, _failure_cause(e))
+            _LOGGER.warning(f"Connection FAILED ({self._baseUrl}): {e!r}")
+            return None
+
+        self._available = True
+        self._breaker.record_success()
+        elapsed = time.perf_counter() - started
+        if status == 401:
+            self._stats.record(path, elapsed, CAUSE_AUTH)
+            raise AuthenticationFailed(f"Authentication failed for {self._baseUrl}")
+        if status != 200:
+            self._stats.record(path, elapsed, http_cause(status))
+            _LOGGER.error(f"Request failed with '{status}' for '{path}'")
+            return None
+        self._stats.record(path, elapsed)
+        return text
+
+    @staticmethod
+    def _parse(text):
+        if text is None:
+            return None
+        try:
+            return ET.fromstring(text)
+        except ET.ParseError as e:
+            _LOGGER.error(f"Invalid response from box: {e}")
+            return None
+
+    async def _call(self, path, data=None):
+        text = await self._request(path, data)
+        root = self._parse(text)
+        if root is None and text is not None:
+            self._stats[path].failures[CAUSE_PARSE] += 1
+        return root
+
+    async def async_get_file(self, path, etag=None, last_modified=None):
+        """Fetch a file from the box, revalidating a cached copy if given.
+
+        Returns the status, the response headers and the body, which is
+        only set for a ``200`` response. The status is ``None`` if the
+        box could not be reached.
+        """
+        try:
+            await self._breaker.async_check()
+        except BoxUnavailable:
+            self._stats.record(DreamboxApi.URL_FILE, None, CAUSE_UNAVAILABLE)
+            return None, {}, None
+        headers = {}
+        if etag:
+            headers[hdrs.IF_NONE_MATCH] = etag
+        if last_modified:
+            headers[hdrs.IF_MODIFIED_SINCE] = last_modified
+        started = time.perf_counter()
+        try:
+            async with self._semaphore:
+                async with self._session.get(
+                    self._url(DreamboxApi.URL_FILE),
+                    params={"file": path},
+                    headers=headers,
+                    auth=self._auth,
+                    timeout=self._timeout,
+                ) as response:
+                    self._breaker.record_success()
+                    body = None
+                    if response.status == 200:
+                        body = await response.read()
+                    self._stats.record(
+                        DreamboxApi.URL_FILE,
+                        time.perf_counter() - started,
+                        None
+                        if response.status in (200, 304)
+                        else http_cause(response.status),
+                    )
+                    return response.status, response.headers, body
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self._breaker.record_failure()
+            self._stats.record(DreamboxApi.URL_FILE, None, _failure_cause(e))
+            _LOGGER.debug(f"Fetching '{path}' from {self._baseUrl} failed: {e!r}")
+            return None, {}, None
+
+    async def async_get_session(self):
+        self._sessionid = None
+        root = await self._call(DreamboxApi.URL_SESSION)
+        if root is None:
+            _LOGGER.warning("Session request failed!")
+            return
+        self._sessionid = root.text
+
+    async def async_get_deviceinfo(self):
+        self._load_deviceinfo(await self._request(DreamboxApi.URL_DEVICEINFO))
+
+    async def async_get_hdds(self):
+        """Refresh the device information, returns the disks of the box."""
+        text = await self._request(DreamboxApi.URL_DEVICEINFO)
+        root = self._parse(text)
+        if root is None:
+            return None
+        self._load_deviceinfo(text)
+        return parse_hdds(root)
+
+    async def async_get_signal(self):
+        """Return lock, SNR, BER and AGC of the tuner in use."""
+        return parse_signal(await self._call(URL_SIGNAL))
+
+    async def async_get_proc(self, name):
+        """Return the status and contents of ``/proc/<name>``.
+
+        The contents are ``None`` on failure, the status is ``None`` if
+        the box could not be reached.
+        """
+        status, _, body = await self.async_get_file(f"/proc/{name}")
+        if status != 200 or body is None:
+            return status, None
+        return status, body.decode(errors="replace")
+
+    def _load_deviceinfo(self, text):
+        root = self._parse(text)
+        if root is None:
+            return
+        self._deviceinfo = DeviceInfo(root)
+        self._deviceinfo_xml = text
+
+    async def async_get_powerstate(self):
+        await self.async_set_powerstate(DreamboxApi.POWER_GET)
+
+    async def async_set_powerstate(self, state):
+        root = await self._call(DreamboxApi.URL_POWERSTATE, {"newstate": state})
+        if root is None:
+            return
+        self._instandby = root.find("e2instandby").text.strip().lower() == "true"
+
+    async def async_set_standby(self, standby):
+        await self.async_set_powerstate(
+            DreamboxApi.POWER_STANDBY if standby else DreamboxApi.POWER_WAKEUP
+        )
+
+    async def _async_volume(self, data=None):
+        root = await self._call(DreamboxApi.URL_VOLUME, data)
+        if root is None:
+            return
+        self._volume = Volume(root)
+
+    async def async_get_volume(self):
+        await self._async_volume()
+
+    async def async_set_volume(self, target):
+        await self._async_volume({"set": f"set{int(target)}"})
+
+    async def async_volume_up(self):
+        await self._async_volume({"set": "up"})
+
+    async def async_volume_down(self):
+        await self._async_volume({"set": "down"})
+
+    async def async_set_muted(self, muted):
+        await self.async_get_volume()
+        if self._volume and self._volume.muted != muted:
+            await self._async_volume({"set": "mute"})
+
+    async def async_get_current(self):
+        root = await self._call(DreamboxApi.URL_CURRENT)
+        if root is None:
+            return
+        self._current = Service(root.find("e2service"), events=root.find("e2eventlist"))
+        self._volume = Volume(root.find("e2volume"))
+
+    async def async_get_epg_now(self, bouquet_ref):
+        """Return the current programme of all services of a bouquet."""
+        root = await self._call(URL_EPG_NOW, {"bRef": bouquet_ref})
+        if root is None:
+            return None
+        return parse_events(root)
+
+    async def async_get_epg_next(self, bouquet_ref):
+        """Return the next programme of all services of a bouquet."""
+        root = await self._call(URL_EPG_NEXT, {"bRef": bouquet_ref})
+        if root is None:
+            return None
+        return parse_events(root)
+
+    async def async_get_locations(self):
+        """Return the directories recordings are kept in."""
+        root = await self._call(URL_LOCATIONS)
+        if root is None:
+            return None
+        return [
+            location.text.strip()
+            for location in root.iter("e2location")
+            if location.text and location.text.strip()
+        ]
+
+    async def async_get_directory(self, path):
+        """Return the change token and the sub directories of a directory."""
+        root = await self._call(URL_MEDIAPLAYERLIST, {"path": path})
+        if root is None:
+            return None
+        return parse_directory(root, path)
+
+    async def async_get_movies(self, path):
+        """Return the recordings in a directory, newest first."""
+        root = await self._call(URL_MOVIELIST, {"dirname": path})
+        if root is None:
+            return None
+        return parse_movies(root)
+
+    async def async_get_services(self, ref, cls=Service):
+        root = await self._call(DreamboxApi.URL_SERVICES, {"sRef": ref})
+        if root is None:
+            return []
+        return [cls(service) for service in root.iter("e2service")]
+
+    async def async_get_bouquets(self):
+        """Fetch all bouquets, returns whether the bouquet list changed.
+
+        The raw responses are hashed before parsing, an unchanged bouquet
+        list is neither parsed nor indexed again.
+        """
+        lists = await asyncio.gather(
+            self._request(DreamboxApi.URL_SERVICES, {"sRef": DreamboxApi.TV_BOUQUETS}),
+            self._request(
+                DreamboxApi.URL_SERVICES, {"sRef": DreamboxApi.RADIO_BOUQUETS}
+            ),
+        )
+        if None in lists:
+            return False
+        refs = [bouquet.ref for bouquet in self._parse_services(lists, ServiceList)]
+        if not refs:
+            return False
+        services = await asyncio.gather(
+            *(self._request(DreamboxApi.URL_SERVICES, {"sRef": ref}) for ref in refs)
+        )
+        if None in services:
+            return False
+        raw = {"lists": lists, "services": dict(zip(refs, services))}
+        return await self._async_load_bouquets(raw, self._index.revision)
+
+    def _parse_services(self, texts, cls=Service):
+        services = []
+        for text in texts:
+            root = self._parse(text)
+            if root is not None:
+                services.extend(cls(service) for service in root.iter("e2service"))
+        return services
+
+    def _build_bouquets(self, raw, revision):
+        """Parse and index a raw bouquet list, runs in the executor.
+
+        Returns ``None`` if the list is unchanged from ``revision`` or
+        can't be parsed.
+        """
+        if content_hash(raw) == revision:
+            return None
+        bouquets = self._parse_services(raw["lists"], ServiceList)
+        if not bouquets:
+            return None
+        for bouquet in bouquets:
+            bouquet.services = self._parse_services([raw["services"].get(bouquet.ref)])
+        return bouquets, BouquetIndex(bouquets, content_hash(raw)).prepare()
+
+    async def _async_load_bouquets(self, raw, revision=None):
+        built = await self._async_add_executor_job(self._build_bouquets, raw, revision)
+        if built is None:
+            return False
+        bouquets, index = built
+        self._bouquets = bouquets
+        self._bouquets_xml = raw
+        self._index = index
+        self._bouquet = index.bouquet(self._defaultBouquet) or bouquets[0]
+        return True
+
+    async def _async_add_executor_job(self, func, *args):
+        if self._executor is not None:
+            return await self._executor(func, *args)
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    def snapshot(self):
+        """Return the raw device information and bouquets for persisting."""
+        return {"deviceinfo": self._deviceinfo_xml, "bouquets": self._bouquets_xml}
+
+    async def async_restore(self, snapshot):
+        """Load device information and bouquets from a snapshot."""
+        if snapshot.get("deviceinfo"):
+            self._load_deviceinfo(snapshot["deviceinfo"])
+        if snapshot.get("bouquets"):
+            await self._async_load_bouquets(snapshot["bouquets"])
+
+    async def async_remote_keypress(self, code):
+        root = await self._call(DreamboxApi.URL_REMOTECONTROL, {"command": code})
+        if root is None:
+            return None
+        return SimpleResult(root)
+
+    async def async_send_keys(self, codes, delay=0):
+        """Send a sequence of remote control keys in order.
+
+        Each key is sent as soon as the box acknowledged the previous one,
+        over the keep-alive connection of the session. Returns the number
+        of keys sent, the sequence stops at the first key that failed.
+        """
+        sent = 0
+        for code in codes:
+            if sent and delay:
+                await asyncio.sleep(delay)
+            if await self.async_remote_keypress(code) is None:
+                _LOGGER.warning(f"Key {code} failed, {len(codes) - sent} keys dropped")
+                break
+            sent += 1
+        return sent
+
+    async def async_get_timer_list(self):
+        """Return the raw timer list, it is parsed by the timer cache."""
+        return await self._request(URL_TIMERLIST)
+
+    @staticmethod
+    def _timer_args(timer):
+        args = {
+            "sRef": timer.ref,
+            "begin": timer.begin,
+            "end": timer.end,
+            "name": timer.name or "",
+            "description": timer.description or "",
+            "disabled": int(bool(timer.disabled)),
+            "justplay": int(bool(timer.justplay)),
+            "afterevent": (
+                AFTER_EVENT_AUTO if timer.afterevent is None else timer.afterevent
+            ),
+            "repeated": timer.repeated or 0,
+        }
+        if timer.dirname:
+            args["dirname"] = timer.dirname
+        return args
+
+    async def _async_timer(self, path, args):
+        root = await self._call(path, args)
+        if root is None:
+            return None
+        return SimpleResult(root)
+
+    async def async_add_timer(self, timer):
+        return await self._async_timer(URL_TIMERADD, self._timer_args(timer))
+
+    async def async_change_timer(self, old, new):
+        args = self._timer_args(new)
+        args.update(
+            {
+                "channelOld": old.ref,
+                "beginOld": old.begin,
+                "endOld": old.end,
+                "deleteOldOnSave": 1,
+            }
+        )
+        return await self._async_timer(URL_TIMERCHANGE, args)
+
+    async def async_delete_timer(self, timer):
+        return await self._async_timer(
+            URL_TIMERDELETE, {"sRef": timer.ref, "begin": timer.begin, "end": timer.end}
+        )
+
+    async def async_stop(self):
+        return await self.async_remote_keypress(DreamboxApi.KEY_STOP)
+
+    async def async_toggle_play_pause(self):
+        return await self.async_remote_keypress(DreamboxApi.KEY_PLAY_PAUSE)
+
+    async def async_channel_up(self):
+        return await self.async_remote_keypress(KEY_CHANNEL_UP)
+
+    async def async_channel_down(self):
+        return await self.async_remote_keypress(KEY_CHANNEL_DOWN)
+
+    async def async_play_service(self, service, bouquet=None):
+        if not bouquet:
+            bouquet = self._bouquet
+        root = await self._call(
+            DreamboxApi.URL_ZAP, {"sRef": service.ref, "root": bouquet.ref}
+        )
+        if root is None:
+            return None
+        result = SimpleResult(root)
+        if not result.state:
+            _LOGGER.warning(f"Play failed with: {result.text}")
+        else:
+            await self.async_get_current()
+        return result
+
+    async def async_play_recording(self, filename):
+        root = await self._call(DreamboxApi.URL_ZAP, {"sRef": recording_ref(filename)})
+        if root is None:
+            return None
+        result = SimpleResult(root)
+        if not result.state:
+            _LOGGER.warning(f"Playing {filename} failed with: {result.text}")
+        else:
+            await self.async_get_current()
+        return result
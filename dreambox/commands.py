@@ -0,0 +1,147 @@
+"""Ordered command queue for dreamboxes"""
+import asyncio
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+COMMAND_DEBOUNCE = 0.3
+VOLUME_STEP = 5
+
+STEP_VOLUME = "volume"
+STEP_CHANNEL = "channel"
+
+
+class _Steps:
+    __slots__ = ("kind", "steps", "queued", "sent")
+
+    def __init__(self, kind, queued, sent):
+        self.kind = kind
+        self.steps = 0
+        self.queued = queued
+        self.sent = sent
+
+
+class CommandQueue:
+    """Run the commands for a single box strictly in order.
+
+    Volume and channel steps arriving within ``COMMAND_DEBOUNCE`` seconds
+    of each other are collapsed into a single absolute volume change or a
+    single zap to the service the steps would have ended up on.
+    """
+
+    def __init__(self, hass, client):
+        self._hass = hass
+        self._client = client
+        self._tail = None
+        self._steps = None
+        self._timer = None
+        self.last_latency = None
+
+    async def async_run(self, func, *args):
+        """Queue a command and wait for it to be sent."""
+        self._flush()
+        return await self._schedule(self._hass.loop.time(), func, *args)
+
+    async def async_volume_step(self, steps):
+        """Queue a relative volume change by ``steps`` steps."""
+        await self._async_step(STEP_VOLUME, steps)
+
+    async def async_channel_step(self, steps):
+        """Queue a zap ``steps`` services up or down the current bouquet."""
+        await self._async_step(STEP_CHANNEL, steps)
+
+    async def _async_step(self, kind, steps):
+        pending = self._steps
+        if pending is None or pending.kind != kind:
+            self._flush()
+            loop = self._hass.loop
+            pending = self._steps = _Steps(kind, loop.time(), loop.create_future())
+            self._timer = loop.call_later(COMMAND_DEBOUNCE, self._flush)
+        pending.steps += steps
+        await asyncio.shield(pending.sent)
+
+    def _flush(self):
+        pending, self._steps = self._steps, None
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if pending is None:
+            return
+        func = self._send_volume if pending.kind == STEP_VOLUME else self._send_channel
+        task = self._schedule(pending.queued, func, pending.steps)
+        sent = pending.sent
+
+        def _done(task):
+            if sent.done():
+                return
+            if task.cancelled():
+                sent.cancel()
+            elif task.exception() is not None:
+                sent.set_exception(task.exception())
+            else:
+                sent.set_result(task.result())
+
+        task.add_done_callback(_done)
+
+    def _schedule(self, queued, func, *args):
+        previous = self._tail
+
+        async def _run():
+            if previous is not None:
+                await asyncio.wait([previous])
+            try:
+                return await func(*args)
+            finally:
+                self.last_latency = self._hass.loop.time() - queued
+                _LOGGER.debug(
+                    f"{getattr(func, '__name__', func)} sent after "
+                    f"{self.last_latency * 1000:.0f}ms"
+                )
+
+        self._tail = self._hass.async_create_task(_run())
+        return self._tail
+
+    async def _send_volume(self, steps):
+        if not steps:
+            return
+        if self._client.muted is None:
+            # volume not known yet, the box would jump to a step from zero
+            await self._client.async_get_volume()
+        if self._client.muted is None:
+            # still unknown, let the box step
+            for _ in range(abs(steps)):
+                if steps > 0:
+                    await self._client.async_volume_up()
+                else:
+                    await self._client.async_volume_down()
+            return
+        target = min(100, max(0, self._client.volume + steps * VOLUME_STEP))
+        await self._client.async_set_volume(target)
+
+    async def _send_channel(self, steps):
+        if not steps:
+            return
+        service, bouquet = self._step_target(steps)
+        if service is not None:
+            await self._client.async_play_service(service, bouquet)
+            return
+        # current service is not part of a known bouquet, let the box step
+        for _ in range(abs(steps)):
+            if steps > 0:
+                await self._client.async_channel_up()
+            else:
+                await self._client.async_channel_down()
+
+    def _step_target(self, steps):
+        current = self._client.current
+        if current is None:
+            return None, None
+        preferred = [self._client.bouquet.ref] if self._client.bouquet else []
+        service, bouquet = self._client.index.resolve(current.ref, preferred)
+        if service is None:
+            return None, None
+        services = self._client.index.playable(bouquet.ref)
+        position = self._client.index.position(bouquet.ref, service.ref)
+        if position is None:
+            return None, None
+        return services[(position + steps) % len(services)], bouquet
@@ -1,12 +1,13 @@
+import ipaddress
 from urllib.parse import urlparse
 
 import homeassistant.helpers.config_validation as cv
 import voluptuous as vol
-from dreamboxapi.api import AuthenticationFailed, DreamboxApi
 from homeassistant import config_entries
-from homeassistant.components import ssdp
+from homeassistant.components import network, ssdp
 from homeassistant.const import (
     CONF_HOST,
+    CONF_MAC,
     CONF_NAME,
     CONF_PASSWORD,
     CONF_PATH,
@@ -15,8 +16,14 @@ from homeassistant.const import (
     CONF_USERNAME,
 )
 from homeassistant.core import callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
 
+from .client import AuthenticationFailed, DreamboxClient
 from .const import (
+    CONF_PENDING,
+    CONF_SUBNET,
+    CONF_VALIDATED,
     DEFAULT_NAME,
     DEFAULT_PASSWORD,
     DEFAULT_PICON_PATH,
@@ -25,6 +32,7 @@ from .const import (
     DEFAULT_USERNAME,
     DOMAIN,
 )
+from .discovery import async_scan, subnet_hosts
 
 DATA_SCHEMA_USER = vol.Schema(
     {
@@ -42,6 +50,8 @@ RESULT_CANNOT_CONNECT = "cannot_connect"
 RESULT_INVALID_AUTH = "invalid_auth"
 RESULT_SUCCESS = "success"
 
+SSDP_DEVICE_TYPE = "urn:dreambox-de:device:Dreambox:1"
+
 
 class DreamboxConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Handle a Dreambox config flow."""
@@ -64,9 +74,20 @@ class DreamboxConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         self._ssl = DEFAULT_SSL
         self._piconpath = DEFAULT_PICON_PATH
         self._api = None
+        self._snapshot = None
+        self._validated = None
+
+    @callback
+    def async_remove(self):
+        """Drop the device information the setup didn't pick up."""
+        pending = self.hass.data.get(DOMAIN, {}).get(CONF_PENDING)
+        if pending and self._snapshot is not None:
+            if pending.get(self._host) is self._snapshot:
+                del pending[self._host]
 
-    def _checkConnection(self):
-        self._api = DreamboxApi(
+    async def _async_check_connection(self):
+        self._api = DreamboxClient(
+            async_get_clientsession(self.hass, verify_ssl=False),
             host=self._host,
             port=self._port,
             user=self._username,
@@ -75,10 +96,10 @@ class DreamboxConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             piconpath=self._piconpath,
         )
         try:
-            self._api.get_deviceinfo()
+            await self._api.async_get_deviceinfo()
         except AuthenticationFailed:
             return RESULT_INVALID_AUTH
-        if not self._api.available:
+        if not self._api.available or self._api.deviceinfo is None:
             return RESULT_CANNOT_CONNECT
         return RESULT_SUCCESS
 
@@ -92,13 +113,22 @@ class DreamboxConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             CONF_SSL: self._ssl,
             CONF_PATH: self._piconpath,
         }
+        domain_data = self.hass.data.get(DOMAIN)
+        if domain_data is not None and self._api is not None:
+            # hand the validated device information over to the setup
+            self._snapshot = self._api.snapshot()
+            domain_data[CONF_PENDING][self._host] = self._snapshot
         return self.async_create_entry(title=self._name, data=data)
 
     async def async_step_import(self, user_input=None):
         """Handle configuration by yaml file."""
-        return await self.async_step_user(user_input)
+        return await self.async_step_manual(user_input)
 
     async def async_step_user(self, user_input=None):
+        """Let the user enter a box or scan the network for boxes."""
+        return self.async_show_menu(step_id="user", menu_options=["manual", "scan"])
+
+    async def async_step_manual(self, user_input=None):
         errors = {}
         if user_input is not None:
             self._name = user_input[CONF_NAME]
@@ -113,8 +143,8 @@ class DreamboxConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 if entry.data[CONF_HOST] == user_input[CONF_HOST]:
                     return self.async_abort(reason="already_configured")
 
-            result = await self.hass.async_add_executor_job(self._checkConnection)
-            if RESULT_SUCCESS:
+            result = await self._async_check_connection()
+            if result == RESULT_SUCCESS:
                 await self.async_set_unique_id(self._api.mac)
                 self._abort_if_unique_id_configured({CONF_HOST: self._host})
 
@@ -135,10 +165,124 @@ class DreamboxConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             else:
                 errors["base"] = result
         return self.async_show_form(
-            step_id="user",
+            step_id="manual",
             data_schema=DATA_SCHEMA_USER,
+            errors=errors,
+        )
+
+    async def _async_default_subnet(self):
+        try:
+            address = await network.async_get_source_ip(self.hass)
+        except HomeAssistantError:
+            return ""
+        return str(ipaddress.ip_network(f"{address}/24", strict=False))
+
+    async def _async_ssdp_hosts(self):
+        if "ssdp" not in self.hass.config.components:
+            return []
+        hosts = []
+        for info in await ssdp.async_get_discovery_info_by_st(
+            self.hass, SSDP_DEVICE_TYPE
+        ):
+            host = urlparse(info.ssdp_location or "").hostname
+            if host:
+                hosts.append(host)
+        return hosts
+
+    async def async_step_scan(self, user_input=None):
+        """Probe the hosts of a subnet and of SSDP announcements for boxes.
+
+        Every box found is offered as a discovered integration, the
+        connection is checked again when the user confirms it. The password
+        is not handed over, only the user name and whether the box
+        accepted the credentials.
+        """
+        errors = {}
+        if user_input is not None:
+            try:
+                hosts = subnet_hosts(user_input[CONF_SUBNET])
+            except ValueError:
+                hosts = None
+                errors[CONF_SUBNET] = "invalid_subnet"
+            if hosts is None and not errors:
+                errors[CONF_SUBNET] = "subnet_too_large"
+            if not errors:
+                configured = {
+                    entry.data[CONF_HOST]
+                    for entry in self.hass.config_entries.async_entries(DOMAIN)
+                }
+                candidates = list(dict.fromkeys(await self._async_ssdp_hosts() + hosts))
+                found = await async_scan(
+                    async_get_clientsession(self.hass, verify_ssl=False),
+                    [host for host in candidates if host not in configured],
+                    user_input[CONF_PORT],
+                    user_input[CONF_USERNAME],
+                    user_input[CONF_PASSWORD],
+                    user_input[CONF_SSL],
+                )
+                for result in found:
+                    self.hass.async_create_task(
+                        self.hass.config_entries.flow.async_init(
+                            DOMAIN,
+                            context={
+                                "source": config_entries.SOURCE_INTEGRATION_DISCOVERY
+                            },
+                            data={
+                                CONF_HOST: result.host,
+                                CONF_PORT: user_input[CONF_PORT],
+                                CONF_SSL: user_input[CONF_SSL],
+                                CONF_MAC: result.mac,
+                                CONF_USERNAME: user_input[CONF_USERNAME],
+                                CONF_VALIDATED: result.mac is not None,
+                            },
+                        )
+                    )
+                if found:
+                    return self.async_abort(
+                        reason="scan_finished",
+                        description_placeholders={"count": str(len(found))},
+                    )
+                errors["base"] = "no_devices_found"
+            subnet = user_input[CONF_SUBNET]
+        else:
+            subnet = await self._async_default_subnet()
+        return self.async_show_form(
+            step_id="scan",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(CONF_SUBNET, default=subnet): cv.string,
+                    vol.Optional(CONF_PORT, default=DEFAULT_PORT): cv.port,
+                    vol.Optional(CONF_USERNAME, default=DEFAULT_USERNAME): cv.string,
+                    vol.Optional(CONF_PASSWORD, default=DEFAULT_PASSWORD): cv.string,
+                    vol.Optional(CONF_SSL, default=DEFAULT_SSL): cv.boolean,
+                }
+            ),
+            errors=errors,
         )
 
+    async def async_step_integration_discovery(self, discovery_info):
+        """Handle a box found by a network scan."""
+        self._host = discovery_info[CONF_HOST]
+        self._port = discovery_info[CONF_PORT]
+        self._ssl = discovery_info[CONF_SSL]
+        self._username = discovery_info.get(CONF_USERNAME, DEFAULT_USERNAME)
+        self._validated = discovery_info.get(CONF_VALIDATED)
+        self._name = DEFAULT_NAME
+        if discovery_info[CONF_MAC]:
+            await self.async_set_unique_id(discovery_info[CONF_MAC])
+            self._abort_if_unique_id_configured({CONF_HOST: self._host})
+
+        self.context[CONF_HOST] = self._host
+        for progress in self._async_in_progress():
+            if progress.get("context", {}).get(CONF_HOST) == self._host:
+                return self.async_abort(reason="already_in_progress")
+        for entry in self.hass.config_entries.async_entries(DOMAIN):
+            if entry.data[CONF_HOST] == self._host:
+                return self.async_abort(reason="already_configured")
+
+        self.context.update({"title_placeholders": {"name": self._name}})
+        return await self.async_step_confirm()
+
     async def async_step_ssdp(self, discovery_info):
         """Handle a flow initialized by ssdp discovery."""
         url = urlparse(discovery_info.upnp[ssdp.ATTR_UPNP_PRESENTATION_URL])
@@ -176,10 +320,16 @@ class DreamboxConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             self._password = user_input[CONF_PASSWORD]
             self._ssl = user_input[CONF_SSL]
             self._piconpath = user_input[CONF_PATH]
-            result = await self.hass.async_add_executor_job(self._checkConnection)
+            result = await self._async_check_connection()
             if result == RESULT_SUCCESS:
+                if self.unique_id is None:
+                    await self.async_set_unique_id(self._api.mac)
+                    self._abort_if_unique_id_configured({CONF_HOST: self._host})
                 return self._getEntry()
             errors["base"] = result
+        elif self._validated is False:
+            # the box rejected the credentials of the scan
+            errors["base"] = RESULT_INVALID_AUTH
         data = vol.Schema(
             {
                 vol.Optional(CONF_NAME, default=self._name): cv.string,
@@ -1,8 +1,16 @@
+from datetime import timedelta
+
 ATTR_MEDIA_DESCRIPTION = "media_description"
 ATTR_MEDIA_END_TIME = "media_end_time"
 ATTR_MEDIA_START_TIME = "media_start_time"
+ATTR_MEDIA_STREAM = "media_stream"
 
 CONF_CONNECTIONS = "connections"
+CONF_COORDINATORS = "coordinators"
+CONF_PENDING = "pending"
+CONF_SCHEDULER = "scheduler"
+CONF_SUBNET = "subnet"
+CONF_VALIDATED = "validated"
 
 DEFAULT_NAME = "Dreambox"
 DEFAULT_PORT = 80
@@ -13,4 +21,15 @@ DEFAULT_PICON_PATH = ""
 
 DOMAIN = "dreambox"
 
-PLATFORMS = ["media_player"]
+PLATFORMS = ["binary_sensor", "media_player", "remote", "sensor"]
+
+STORAGE_SAVE_DELAY = 10
+STORAGE_VERSION = 1
+
+BOUQUET_REFRESH_INTERVAL = timedelta(hours=1)
+COMMAND_FAST_POLL_DURATION = timedelta(seconds=30)
+COMMAND_VERIFY_DELAY = timedelta(seconds=2)
+FAST_SCAN_INTERVAL = timedelta(seconds=10)
+IDLE_SCAN_INTERVAL = timedelta(seconds=60)
+OFFLINE_SCAN_INTERVAL = timedelta(seconds=30)
+MAX_SCAN_INTERVAL = timedelta(minutes=5)
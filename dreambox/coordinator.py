@@ -0,0 +1,206 @@
+"""Data update coordinator for dreamboxes"""
+import asyncio
+import inspect
+import logging
+import time
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_NAME
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import STORAGE_DIR, Store
+from homeassistant.helpers.update_coordinator import (
+    DataUpdateCoordinator,
+    UpdateFailed,
+)
+from homeassistant.util import dt as dt_util
+
+from .breaker import BoxUnavailable
+from .commands import CommandQueue
+from .const import (
+    BOUQUET_REFRESH_INTERVAL,
+    COMMAND_FAST_POLL_DURATION,
+    DOMAIN,
+    FAST_SCAN_INTERVAL,
+    IDLE_SCAN_INTERVAL,
+    MAX_SCAN_INTERVAL,
+    OFFLINE_SCAN_INTERVAL,
+    STORAGE_SAVE_DELAY,
+    STORAGE_VERSION,
+)
+from .epg import EpgCache
+from .health import HealthMonitor
+from .picon import PiconCache
+from .recordings import RecordingLibrary
+from .stats import CAUSE_CONNECTION, CAUSE_UNAVAILABLE, ENDPOINT_POLL
+from .timers import TimerCache
+
+_LOGGER = logging.getLogger(__name__)
+
+# taken as argument since Home Assistant 2024.11, required from 2026.8
+_ENTRY_ARGUMENT = (
+    "config_entry" in inspect.signature(DataUpdateCoordinator.__init__).parameters
+)
+
+
+def picon_cache_path(hass: HomeAssistant, entry_id):
+    """Return the directory picons of a config entry are cached in."""
+    return hass.config.path(STORAGE_DIR, DOMAIN, "picons", entry_id)
+
+
+def storage_key(entry_id):
+    """Return the storage key the box data of a config entry is kept under."""
+    return f"{DOMAIN}.{entry_id}"
+
+
+class DreamboxDataUpdateCoordinator(DataUpdateCoordinator):
+    """Poll a single Dreambox and share the result with all platforms.
+
+    The poll interval adapts to the state of the box: fast while it is
+    playing or right after a command, slow in standby and backing off
+    exponentially while the box is unreachable. Polls are phase shifted
+    and concurrency limited by the domain wide ``PollScheduler``.
+
+    The now/next EPG of the active and the default bouquet is cached and
+    refreshed in batches as programmes end. Health values are fetched
+    along with the poll when their group is due.
+
+    Device information and bouquets are persisted so that a known box
+    can be set up from the cache while it is still asleep.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry: ConfigEntry, api, scheduler):
+        super().__init__(
+            hass,
+            _LOGGER,
+            name=entry.data[CONF_NAME],
+            update_interval=FAST_SCAN_INTERVAL,
+            **({"config_entry": entry} if _ENTRY_ARGUMENT else {}),
+        )
+        self.config_entry = entry
+        self.api = api
+        self.scheduler = scheduler
+        self.commands = CommandQueue(hass, api)
+        self.epg = EpgCache(
+            hass, api, self.async_update_listeners, scheduler, self.name
+        )
+        self.health = HealthMonitor(api)
+        self.recordings = RecordingLibrary(api)
+        self.timers = TimerCache(api)
+        self.picons = PiconCache(hass, api, picon_cache_path(hass, entry.entry_id))
+        self._store = Store(hass, STORAGE_VERSION, storage_key(entry.entry_id))
+        self._failures = 0
+        self._interval = FAST_SCAN_INTERVAL
+        self._fast_poll_until = None
+        self._deviceinfo_fetched = False
+        self._bouquets_fetched = None
+
+    @property
+    def interval(self):
+        """The nominal poll interval, before phase alignment."""
+        return self._interval
+
+    async def async_restore(self, validated=None):
+        """Load the persisted box data, returns whether the box is known.
+
+        ``validated`` is the snapshot the config flow took of a new box,
+        its device information is not fetched again.
+        """
+        snapshot = await self._store.async_load()
+        if snapshot:
+            await self.api.async_restore(snapshot)
+        known = self.api.deviceinfo is not None
+        if validated:
+            await self.api.async_restore(validated)
+            self._deviceinfo_fetched = self.api.deviceinfo is not None
+            if self._deviceinfo_fetched:
+                self._async_persist()
+        return known
+
+    @callback
+    def _async_persist(self):
+        self._store.async_delay_save(self.api.snapshot, STORAGE_SAVE_DELAY)
+
+    async def _async_update(self):
+        await self.api.async_get_powerstate()
+        if not self.api.available:
+            raise UpdateFailed(f"{self.name} is not reachable")
+
+        changed = False
+        if not self._deviceinfo_fetched:
+            await self.api.async_get_deviceinfo()
+            if not self.api.available or self.api.deviceinfo is None:
+                raise UpdateFailed("Failed to obtain device information")
+            self._deviceinfo_fetched = changed = True
+
+        # due health groups go out alongside the status poll
+        await asyncio.gather(self.api.async_get_current(), self.health.async_update())
+
+        now = time.monotonic()
+        if (
+            self._bouquets_fetched is None
+            or now - self._bouquets_fetched > BOUQUET_REFRESH_INTERVAL.total_seconds()
+        ):
+            changed |= await self.api.async_get_bouquets()
+            self._bouquets_fetched = now
+
+        if changed:
+            self._async_persist()
+
+    async def _async_update_data(self):
+        started = time.perf_counter()
+        try:
+            try:
+                async with self.scheduler.async_slot(self.name):
+                    await self._async_update()
+            except BoxUnavailable as err:
+                raise UpdateFailed(str(err)) from err
+        except UpdateFailed as err:
+            cause = (
+                CAUSE_UNAVAILABLE
+                if isinstance(err.__cause__, BoxUnavailable)
+                else CAUSE_CONNECTION
+            )
+            self.api.stats.record(ENDPOINT_POLL, None, cause)
+            self._failures += 1
+            self._set_interval(self._next_interval())
+            raise
+        self.api.stats.record(ENDPOINT_POLL, time.perf_counter() - started)
+        self._failures = 0
+        self._set_interval(self._next_interval())
+        bouquets = (self._active_bouquet(), self.api.bouquet)
+        self.epg.async_track([bouquet.ref for bouquet in bouquets if bouquet])
+        return self.api
+
+    def _active_bouquet(self):
+        """Return the bouquet the current service was zapped from."""
+        current = self.api.current
+        if current is None:
+            return None
+        preferred = [self.api.bouquet.ref] if self.api.bouquet else []
+        _, bouquet = self.api.index.resolve(current.ref, preferred)
+        return bouquet
+
+    def _set_interval(self, interval):
+        self._interval = interval
+        self.update_interval = self.scheduler.align(
+            self.config_entry.entry_id, interval
+        )
+
+    def _next_interval(self):
+        if self._failures:
+            return min(
+                OFFLINE_SCAN_INTERVAL * 2 ** (self._failures - 1), MAX_SCAN_INTERVAL
+            )
+        if self._fast_poll_until and dt_util.utcnow() < self._fast_poll_until:
+            return FAST_SCAN_INTERVAL
+        if self.api.standby:
+            return IDLE_SCAN_INTERVAL
+        return FAST_SCAN_INTERVAL
+
+    @callback
+    def async_fast_poll(self):
+        """Poll fast for a while, the box state is about to change."""
+        self._fast_poll_until = dt_util.utcnow() + COMMAND_FAST_POLL_DURATION
+        if not self._failures and self._interval != FAST_SCAN_INTERVAL:
+            self._set_interval(FAST_SCAN_INTERVAL)
+            self._schedule_refresh()
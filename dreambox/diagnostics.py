@@ -0,0 +1,49 @@
+"""Diagnostics support for dreamboxes"""
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_PASSWORD, CONF_USERNAME
+from homeassistant.core import HomeAssistant
+
+from .const import CONF_CONNECTIONS, CONF_COORDINATORS, DOMAIN
+
+TO_REDACT = {CONF_PASSWORD, CONF_USERNAME}
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry):
+    """Return diagnostics for a config entry."""
+    api = hass.data[DOMAIN][CONF_CONNECTIONS][entry.entry_id]
+    coordinator = hass.data[DOMAIN][CONF_COORDINATORS][entry.entry_id]
+    deviceinfo = api.deviceinfo
+    return {
+        "entry": async_redact_data(entry.as_dict(), TO_REDACT),
+        "box": {
+            "available": api.available,
+            "standby": api.standby,
+            "model": deviceinfo.deviceName.rstrip() if deviceinfo else None,
+            "enigma_version": deviceinfo.enigmaVersion if deviceinfo else None,
+            "bouquets": len(api.bouquets),
+            "services": sum(len(bouquet.services) for bouquet in api.bouquets),
+            "bouquet_revision": api.index.revision,
+        },
+        "breaker": {
+            "state": api.breaker.state,
+            "failures": api.breaker.failures,
+            "retry_in": api.breaker.retry_in,
+        },
+        "coordinator": {
+            "update_interval": coordinator.update_interval.total_seconds(),
+            "poll_interval": coordinator.interval.total_seconds(),
+            "poll_phase": coordinator.scheduler.phase(
+                entry.entry_id, coordinator.interval
+            ),
+            "last_update_success": coordinator.last_update_success,
+            "command_latency": coordinator.commands.last_latency,
+        },
+        "health": {
+            "due": coordinator.health.due(),
+            "unsupported": coordinator.health.unsupported,
+            "values": coordinator.health.data,
+        },
+        "requests": api.stats.as_dict(),
+        "scheduler": coordinator.scheduler.as_dict(),
+    }
@@ -0,0 +1,95 @@
+"""Network scan for dreamboxes"""
+import asyncio
+import ipaddress
+import logging
+from contextlib import suppress
+
+import aiohttp
+
+from .client import AuthenticationFailed, DreamboxClient
+
+_LOGGER = logging.getLogger(__name__)
+
+SCAN_CONCURRENCY = 32
+SCAN_CONNECT_TIMEOUT = 1
+SCAN_MAX_HOSTS = 1024
+SCAN_TIMEOUT = aiohttp.ClientTimeout(total=3, sock_connect=SCAN_CONNECT_TIMEOUT)
+
+
+def subnet_hosts(subnet):
+    """Return the host addresses of a subnet, ``None`` if it is too large."""
+    network = ipaddress.ip_network(subnet, strict=False)
+    if network.num_addresses > SCAN_MAX_HOSTS:
+        return None
+    return [str(host) for host in network.hosts()] or [str(network.network_address)]
+
+
+class ScanResult:
+    """A box found by a scan.
+
+    ``mac`` is the MAC address the box reported, ``None`` if it rejected
+    the credentials the scan was run with.
+    """
+
+    __slots__ = ("host", "mac")
+
+    def __init__(self, host, mac):
+        self.host = host
+        self.mac = mac
+
+
+async def _async_port_open(host, port):
+    try:
+        _, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port), SCAN_CONNECT_TIMEOUT
+        )
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    with suppress(OSError):
+        await writer.wait_closed()
+    return True
+
+
+async def async_probe(session, host, port, user, password, ssl=False):
+    """Return a ``ScanResult`` if a dreambox answers on ``host``.
+
+    Hosts that don't accept connections on ``port`` are skipped before
+    talking HTTP to them, most addresses of a subnet are not in use.
+    """
+    if not await _async_port_open(host, port):
+        return None
+    client = DreamboxClient(
+        session,
+        host=host,
+        port=port,
+        user=user,
+        password=password,
+        https=ssl,
+        timeout=SCAN_TIMEOUT,
+    )
+    try:
+        await client.async_get_deviceinfo()
+    except AuthenticationFailed:
+        return ScanResult(host, None)
+    if client.deviceinfo is None:
+        return None
+    return ScanResult(host, client.mac or None)
+
+
+async def async_scan(session, hosts, port, user, password, ssl=False):
+    """Probe ``hosts`` at the same time and return the boxes found.
+
+    At most ``SCAN_CONCURRENCY`` hosts are probed at once, each one for
+    no longer than a few seconds.
+    """
+    semaphore = asyncio.Semaphore(SCAN_CONCURRENCY)
+
+    async def probe(host):
+        async with semaphore:
+            return await async_probe(session, host, port, user, password, ssl)
+
+    results = await asyncio.gather(*(probe(host) for host in hosts))
+    found = [result for result in results if result is not None]
+    _LOGGER.debug(f"Found {len(found)} dreamboxes on {len(hosts)} hosts")
+    return found
@@ -0,0 +1,216 @@
+"""Now/next EPG cache for dreamboxes"""
+import asyncio
+import logging
+import time
+
+from homeassistant.core import HassJob, callback
+from homeassistant.helpers.event import async_call_later
+
+from .breaker import BoxUnavailable
+
+_LOGGER = logging.getLogger(__name__)
+
+EPG_MIN_REFRESH_DELAY = 5 * 60
+EPG_RETRY_DELAY = 60
+EPG_MAX_REFRESH_DELAY = 60 * 60
+EPG_END_GRACE = 5
+
+
+def _int(text):
+    try:
+        return int(text)
+    except (TypeError, ValueError):
+        return None
+
+
+class EpgEvent:
+    """A single programme of a service."""
+
+    __slots__ = ("ref", "title", "description", "start", "duration")
+
+    def __init__(self, ref, title, description, start, duration):
+        self.ref = ref
+        self.title = title
+        self.description = description
+        self.start = start
+        self.duration = duration
+
+    @property
+    def end(self):
+        if self.start is None or self.duration is None:
+            return None
+        return self.start + self.duration
+
+    @classmethod
+    def from_xml(cls, element):
+        def text(tag):
+            value = element.findtext(tag)
+            if value is None or value == "None":
+                return None
+            return value.strip()
+
+        return cls(
+            text("e2eventservicereference"),
+            text("e2eventtitle"),
+            text("e2eventdescription"),
+            _int(text("e2eventstart")),
+            _int(text("e2eventduration")),
+        )
+
+
+def parse_events(root):
+    """Return the events of an ``e2eventlist`` keyed by service reference."""
+    events = {}
+    if root is None:
+        return events
+    for element in root.iter("e2event"):
+        event = EpgEvent.from_xml(element)
+        if event.ref and event.title:
+            events[event.ref] = event
+    return events
+
+
+class EpgCache:
+    """Now and next programme of every service in the tracked bouquets.
+
+    Both lists are fetched in bulk per bouquet. Instead of polling, a
+    bouquet is fetched again once the first of its current programmes
+    ends, programmes ending in between are shown from the next list.
+    Refreshes are at least ``EPG_MIN_REFRESH_DELAY`` apart and fetch
+    all bouquets due by then at once, in a slot of the poll scheduler.
+    """
+
+    def __init__(self, hass, client, on_update, scheduler, key):
+        self._hass = hass
+        self._client = client
+        self._on_update = on_update
+        self._scheduler = scheduler
+        self._key = key
+        self._now = {}
+        self._next = {}
+        self._lists = {}
+        self._due_at = {}
+        self._bouquet_refs = ()
+        self._task = None
+        self._cancel = None
+
+    @property
+    def bouquet_refs(self):
+        return self._bouquet_refs
+
+    def now(self, ref):
+        return self._current(ref)[0]
+
+    def next(self, ref):
+        return self._current(ref)[1]
+
+    def _current(self, ref):
+        now, upcoming = self._now.get(ref), self._next.get(ref)
+        if now is not None and now.end is not None and now.end <= time.time():
+            # the refresh is due, the next programme has started already
+            return upcoming, None
+        return now, upcoming
+
+    @callback
+    def async_track(self, bouquet_refs):
+        """Make sure the EPG of some bouquets is cached and kept up to date."""
+        bouquet_refs = tuple(dict.fromkeys(ref for ref in bouquet_refs if ref))
+        if not bouquet_refs:
+            return
+        if bouquet_refs == self._bouquet_refs and (self._cancel or self._task):
+            return
+        self._bouquet_refs = bouquet_refs
+        for ref in set(self._lists) - set(bouquet_refs):
+            del self._lists[ref]
+            del self._due_at[ref]
+        self._merge()
+        self._cancel_timer()
+        self._async_start_refresh()
+
+    @callback
+    def _async_start_refresh(self, _now=None):
+        self._cancel = None
+        if self._task is not None:
+            return
+        self._task = self._hass.async_create_background_task(
+            self._async_refresh(self._bouquet_refs),
+            f"dreambox epg {self._client.host}",
+        )
+
+    def _due(self, now):
+        return [
+            ref
+            for ref in self._bouquet_refs
+            if ref not in self._due_at or self._due_at[ref] <= now
+        ]
+
+    async def _async_refresh(self, bouquet_refs):
+        due = self._due(time.time())
+        lists = []
+        try:
+            if due:
+                async with self._scheduler.async_slot(self._key):
+                    lists = await asyncio.gather(
+                        *(
+                            fetch(ref)
+                            for ref in due
+                            for fetch in (
+                                self._client.async_get_epg_now,
+                                self._client.async_get_epg_next,
+                            )
+                        )
+                    )
+        except BoxUnavailable:
+            lists = [None]
+        finally:
+            self._task = None
+        if bouquet_refs != self._bouquet_refs:
+            # the tracked bouquets changed while fetching
+            self._async_start_refresh()
+            return
+        if None in lists:
+            self._schedule(EPG_RETRY_DELAY)
+            return
+        fetched = time.time()
+        for ref, now, upcoming in zip(due, lists[::2], lists[1::2]):
+            self._lists[ref] = (now, upcoming)
+            ends = [event.end + EPG_END_GRACE for event in now.values() if event.end]
+            self._due_at[ref] = min(ends + [fetched + EPG_MAX_REFRESH_DELAY])
+        self._merge()
+        self._schedule(self._next_refresh(fetched))
+        if due:
+            self._on_update()
+
+    def _merge(self):
+        self._now, self._next = {}, {}
+        for ref in self._bouquet_refs:
+            if ref in self._lists:
+                now, upcoming = self._lists[ref]
+                self._now.update(now)
+                self._next.update(upcoming)
+
+    def _next_refresh(self, now):
+        if not self._due_at:
+            return EPG_MAX_REFRESH_DELAY
+        delay = min(self._due_at.values()) - now
+        return min(EPG_MAX_REFRESH_DELAY, max(EPG_MIN_REFRESH_DELAY, delay))
+
+    def _schedule(self, delay):
+        self._cancel_timer()
+        _LOGGER.debug(f"Refreshing EPG of {self._client.host} in {delay:.0f}s")
+        self._cancel = async_call_later(
+            self._hass, delay, HassJob(self._async_start_refresh)
+        )
+
+    def _cancel_timer(self):
+        if self._cancel is not None:
+            self._cancel()
+            self._cancel = None
+
+    @callback
+    def async_shutdown(self):
+        """Stop refreshing, the config entry is unloaded."""
+        self._cancel_timer()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
@@ -0,0 +1,261 @@
+"""Shared health status of dreamboxes"""
+import asyncio
+import logging
+import time
+from collections import Counter
+
+from homeassistant.core import callback
+from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+GROUP_SIGNAL = "signal"
+GROUP_STORAGE = "storage"
+GROUP_SYSTEM = "system"
+
+# seconds between two fetches of a group
+HEALTH_INTERVALS = {
+    GROUP_SIGNAL: 30,
+    GROUP_STORAGE: 10 * 60,
+    GROUP_SYSTEM: 60,
+}
+
+# seconds until a group the box refused is tried again
+HEALTH_UNSUPPORTED_RECHECK = 24 * 60 * 60
+
+# boot times closer than this are the same boot seen through poll jitter
+BOOT_TIME_TOLERANCE = 60
+
+_SIZE_UNITS = {"KB": 1 / 1000**2, "MB": 1 / 1000, "GB": 1, "TB": 1000}
+
+
+class Unsupported(Exception):
+    """The box refuses to report the values of a group."""
+
+
+def _number(text):
+    """Return the leading number of ``12.3 dB`` or ``85 %``."""
+    if not text:
+        return None
+    try:
+        return float(text.split()[0].rstrip("%"))
+    except (IndexError, ValueError):
+        return None
+
+
+def parse_size(text):
+    """Return a size like ``465.76 GB`` in gigabytes."""
+    if not text:
+        return None
+    parts = text.split()
+    value = _number(text)
+    if value is None:
+        return None
+    unit = parts[1].upper() if len(parts) > 1 else "GB"
+    return value * _SIZE_UNITS.get(unit, 1)
+
+
+def parse_signal(root):
+    """Return the tuner status of an ``e2frontendstatus``.
+
+    Older web interfaces don't report the lock, the tuner is considered
+    locked as long as it reports a signal.
+    """
+    if root is None:
+        return None
+    snr = _number(root.findtext("e2snr"))
+    lock = root.findtext("e2lock")
+    if lock is not None:
+        lock = lock.strip().lower() in ("true", "1")
+    elif snr is not None:
+        lock = snr > 0
+    return {
+        "snr": snr,
+        "snr_db": _number(root.findtext("e2snrdb")),
+        "ber": _number(root.findtext("e2ber")),
+        "agc": _number(root.findtext("e2acg")),
+        "lock": lock,
+    }
+
+
+def parse_hdds(root):
+    """Return model, capacity and free space of the disks of a deviceinfo."""
+    if root is None:
+        return None
+    return [
+        {
+            "model": (hdd.findtext("e2model") or "").strip(),
+            "capacity": parse_size(hdd.findtext("e2capacity")),
+            "free": parse_size(hdd.findtext("e2free")),
+        }
+        for hdd in root.iter("e2hdd")
+    ]
+
+
+def parse_loadavg(text):
+    """Return the 1, 5 and 15 minute load averages of ``/proc/loadavg``."""
+    try:
+        return tuple(float(value) for value in text.split()[:3])
+    except (AttributeError, ValueError):
+        return None
+
+
+def parse_uptime(text):
+    """Return the seconds since boot of ``/proc/uptime``."""
+    try:
+        return float(text.split()[0])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+class HealthMonitor:
+    """Health status of a box, shared by all health sensors.
+
+    Sensors subscribe to the group of values they show. Each poll of the
+    coordinator fetches the groups that are due and have subscribers in
+    one go, next to the regular status poll. However many sensors read a
+    group, it costs one fetch per interval, and groups whose sensors are
+    all disabled cost nothing. Groups are fetched at most as often as
+    the box is polled. Groups the box refuses, e.g. ``/proc`` files on
+    boxes which don't serve them, are only tried again after
+    ``HEALTH_UNSUPPORTED_RECHECK``, their sensors are unavailable.
+    """
+
+    def __init__(self, client, intervals=HEALTH_INTERVALS):
+        self._client = client
+        self._intervals = intervals
+        self._subscribers = Counter()
+        self._fetched = {}
+        self._unsupported = {}
+        self.data = {}
+
+    @property
+    def unsupported(self):
+        return list(self._unsupported)
+
+    @callback
+    def async_subscribe(self, group):
+        """Ask for ``group`` to be fetched, returns a callback to stop."""
+        self._subscribers[group] += 1
+
+        @callback
+        def unsubscribe():
+            self._subscribers[group] -= 1
+
+        return unsubscribe
+
+    def due(self, now=None):
+        """Return the subscribed groups whose interval has passed."""
+        now = time.monotonic() if now is None else now
+        return [
+            group
+            for group, count in self._subscribers.items()
+            if count > 0 and now >= self._due_at(group)
+        ]
+
+    def _due_at(self, group):
+        if group in self._unsupported:
+            return self._unsupported[group] + HEALTH_UNSUPPORTED_RECHECK
+        interval = self._intervals[group]
+        return self._fetched.get(group, -interval) + interval
+
+    async def async_update(self):
+        """Fetch all due groups at once, returns the groups fetched."""
+        now = time.monotonic()
+        due = self.due(now)
+        if not due:
+            return []
+        results = await asyncio.gather(
+            *(getattr(self, f"_async_fetch_{group}")() for group in due),
+            return_exceptions=True,
+        )
+        fetched = []
+        for group, values in zip(due, results):
+            if isinstance(values, Unsupported):
+                _LOGGER.debug(f"{self._client.host} doesn't report its {group}")
+                self._unsupported[group] = now
+                self.data.pop(group, None)
+                continue
+            if isinstance(values, Exception) or values is None:
+                # try again with the next poll
+                _LOGGER.debug(f"Fetching {group} of {self._client.host} failed")
+                self.data.pop(group, None)
+                continue
+            self.data[group] = values
+            self._fetched[group] = now
+            self._unsupported.pop(group, None)
+            fetched.append(group)
+        return fetched
+
+    async def _async_fetch_signal(self):
+        return await self._client.async_get_signal()
+
+    async def _async_fetch_storage(self):
+        hdds = await self._client.async_get_hdds()
+        if hdds is None:
+            return None
+        return {
+            "hdds": hdds,
+            "capacity": sum(hdd["capacity"] or 0 for hdd in hdds) if hdds else None,
+            "free": sum(hdd["free"] or 0 for hdd in hdds) if hdds else None,
+        }
+
+    async def _async_fetch_system(self):
+        (loadavg_status, loadavg), (uptime_status, uptime) = await asyncio.gather(
+            self._client.async_get_proc("loadavg"),
+            self._client.async_get_proc("uptime"),
+        )
+        if loadavg_status not in (None, 200) and uptime_status not in (None, 200):
+            # the box answers, but won't hand out its /proc files
+            raise Unsupported
+        loadavg = parse_loadavg(loadavg)
+        uptime = parse_uptime(uptime)
+        if loadavg is None and uptime is None:
+            return None
+        boot_time = None
+        if uptime is not None:
+            boot_time = time.time() - uptime
+            previous = (self.data.get(GROUP_SYSTEM) or {}).get("boot_time")
+            if previous and abs(previous - boot_time) < BOOT_TIME_TOLERANCE:
+                boot_time = previous
+        return {
+            "load_1": loadavg[0] if loadavg else None,
+            "load_5": loadavg[1] if loadavg else None,
+            "load_15": loadavg[2] if loadavg else None,
+            "boot_time": boot_time,
+        }
+
+
+class HealthEntity(CoordinatorEntity):
+    """Base of the entities showing a value of a health group."""
+
+    group = None
+    key = None
+    label = None
+
+    def __init__(self, name, coordinator):
+        super().__init__(coordinator)
+        mac = coordinator.api.mac
+        self._attr_name = f"{name} {self.label}"
+        self._attr_unique_id = f"{mac}_{self.key}"
+        self._attr_device_info = DeviceInfo(identifiers={(DOMAIN, mac)})
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self.async_on_remove(self.coordinator.health.async_subscribe(self.group))
+
+    @property
+    def _values(self):
+        return self.coordinator.health.data.get(self.group)
+
+    @property
+    def _value(self):
+        values = self._values
+        return values.get(self.key) if values else None
+
+    @property
+    def available(self) -> bool:
+        return super().available and self._value is not None
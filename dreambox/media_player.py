@@ -1,6 +1,8 @@
 """Support for dreamboxes"""
+from functools import partial
 from typing import Optional
 
+from homeassistant.components import media_source
 from homeassistant.components.media_player import (
     BrowseError,
     BrowseMedia,
@@ -35,20 +37,34 @@ SUPPORTED_DREAMBOX = (
     | MediaPlayerEntityFeature.VOLUME_STEP
 )
 
+try:
+    from homeassistant.components.media_player import SearchMedia, SearchMediaQuery
+except ImportError:  # Home Assistant before 2025.2 has no media search
+    SearchMedia = SearchMediaQuery = None
+else:
+    SUPPORTED_DREAMBOX |= MediaPlayerEntityFeature.SEARCH_MEDIA
+
 import homeassistant.helpers.config_validation as cv
 import voluptuous as vol
 from homeassistant.components.media_player import (
     PLATFORM_SCHEMA,
     MediaPlayerDeviceClass,
 )
+from homeassistant.core import HassJob, callback
+from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers.device_registry import CONNECTION_NETWORK_MAC
 from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
+from .breaker import BoxUnavailable
 from .const import (
     ATTR_MEDIA_DESCRIPTION,
     ATTR_MEDIA_END_TIME,
     ATTR_MEDIA_START_TIME,
-    CONF_CONNECTIONS,
+    ATTR_MEDIA_STREAM,
+    COMMAND_VERIFY_DELAY,
+    CONF_COORDINATORS,
     DEFAULT_NAME,
     DEFAULT_PASSWORD,
     DEFAULT_PICON_PATH,
@@ -57,6 +73,41 @@ from .const import (
     DEFAULT_USERNAME,
     DOMAIN,
 )
+from .media_source import (
+    KIND_RECORDING,
+    KIND_SERVICE,
+    parse_identifier,
+    service_identifier,
+)
+
+VERIFY_POWER = "power"
+VERIFY_VOLUME = "volume"
+VERIFY_SERVICE = "service"
+
+BROWSE_PAGE_SIZE = 100
+SEARCH_LIMIT = 50
+
+MEDIA_TYPE_BOUQUET_PAGE = "bouquet_page"
+
+
+def page_id(bucket, page, bouquet_ref):
+    """Return the content id of a page of an A-Z bucket of a bouquet."""
+    return f"{bucket}:{page}:{bouquet_ref}"
+
+
+def parse_page_id(media_content_id):
+    try:
+        bucket, page, ref = (media_content_id or "").split(":", 2)
+        return bucket, int(page), ref
+    except ValueError:
+        return None, 0, None
+
+
+VERIFY_FETCH = {
+    VERIFY_POWER: "async_get_powerstate",
+    VERIFY_VOLUME: "async_get_volume",
+    VERIFY_SERVICE: "async_get_current",
+}
 
 PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend(
     {
@@ -72,17 +123,26 @@ PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend(
 
 
 async def async_setup_entry(hass, config_entry, async_add_entities):
-    device = hass.data[DOMAIN][CONF_CONNECTIONS][config_entry.entry_id]
-    async_add_entities([DreamboxDevice(config_entry.data[CONF_NAME], device)], True)
+    coordinator = hass.data[DOMAIN][CONF_COORDINATORS][config_entry.entry_id]
+    async_add_entities([DreamboxDevice(config_entry.data[CONF_NAME], coordinator)])
 
 
-class DreamboxDevice(MediaPlayerEntity):
+class DreamboxDevice(CoordinatorEntity, MediaPlayerEntity):
     """Representation of an Enigma2 box."""
 
-    def __init__(self, name, device):
+    _unrecorded_attributes = frozenset(
+        {ATTR_MEDIA_DESCRIPTION, ATTR_MEDIA_START_TIME, ATTR_MEDIA_END_TIME}
+    )
+
+    def __init__(self, name, coordinator):
         """Initialize the Enigma2 device."""
+        super().__init__(coordinator)
+        device = coordinator.api
         self._name = name
         self._bouquet = None
+        self._browse_cache = {}
+        self._browse_revision = None
+        self._verify = {}
         self._dreambox = device
         self._attr_device_class = MediaPlayerDeviceClass.RECEIVER
         self._attr_device_info = DeviceInfo(
@@ -98,62 +158,187 @@ class DreamboxDevice(MediaPlayerEntity):
         self._attr_supported_features = SUPPORTED_DREAMBOX
         self._attr_unique_id = device.mac
         self._attr_media_content_type = MediaType.TVSHOW
+        self._update_attrs()
+        self._last_snapshot = self._snapshot()
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Cancel pending verifications."""
+        await super().async_will_remove_from_hass()
+        for cancel in self._verify.values():
+            cancel()
+        self._verify.clear()
+
+    async def _async_command(self, func, *args):
+        try:
+            await self.coordinator.commands.async_run(func, *args)
+        except BoxUnavailable as err:
+            raise HomeAssistantError(f"{self._name} is not reachable") from err
+        self.coordinator.async_fast_poll()
+
+    async def _async_step(self, func, steps, verify):
+        try:
+            await func(steps)
+        except BoxUnavailable as err:
+            raise HomeAssistantError(f"{self._name} is not reachable") from err
+        self.coordinator.async_fast_poll()
+        self._schedule_verify(verify)
+
+    async def _async_optimistic(self, verify, attrs, func, *args):
+        """Show the expected outcome of a command right away.
+
+        Only the field affected by the command is fetched again shortly
+        afterwards, which rolls the state back if the box disagrees.
+        """
+        previous = {name: getattr(self, name) for name in attrs}
+        for name, value in attrs.items():
+            setattr(self, name, value)
+        self._async_write_state_if_changed()
+        try:
+            await self._async_command(func, *args)
+        except Exception:
+            for name, value in previous.items():
+                setattr(self, name, value)
+            self._async_write_state_if_changed()
+            raise
+        self._schedule_verify(verify)
+
+    @callback
+    def _schedule_verify(self, verify):
+        if cancel := self._verify.pop(verify, None):
+            cancel()
+        self._verify[verify] = async_call_later(
+            self.hass,
+            COMMAND_VERIFY_DELAY,
+            HassJob(partial(self._async_verify, verify)),
+        )
 
-    def turn_off(self):
+    async def _async_verify(self, verify, _now=None):
+        self._verify.pop(verify, None)
+        fetch = getattr(self._dreambox, VERIFY_FETCH[verify])
+        try:
+            await self.coordinator.commands.async_run(fetch)
+        except BoxUnavailable:
+            return
+        self._update_attrs()
+        self._async_write_state_if_changed()
+        if verify == VERIFY_POWER and not self._dreambox.standby:
+            # the box woke up, the current service and EPG are unknown
+            await self.coordinator.async_request_refresh()
+
+    async def async_turn_off(self) -> None:
         """Turn off media player."""
-        self._dreambox.standby = True
+        await self._async_optimistic(
+            VERIFY_POWER,
+            {"_attr_state": MediaPlayerState.OFF},
+            self._dreambox.async_set_standby,
+            True,
+        )
 
-    def turn_on(self):
+    async def async_turn_on(self) -> None:
         """Turn the media player on."""
-        self._dreambox.standby = False
+        state = (
+            MediaPlayerState.PLAYING if self._dreambox.current else MediaPlayerState.ON
+        )
+        await self._async_optimistic(
+            VERIFY_POWER,
+            {"_attr_state": state},
+            self._dreambox.async_set_standby,
+            False,
+        )
 
     @property
     def media_image_url(self) -> Optional[str]:
         return self._dreambox.picon()
 
-    def set_volume_level(self, volume) -> None:
+    async def async_get_media_image(self):
+        """Serve the picon of the current service from the local cache."""
+        return await self.coordinator.picons.async_get(self._dreambox.current)
+
+    async def async_get_browse_image(
+        self, media_content_type, media_content_id, media_image_id=None
+    ):
+        """Serve the picon thumbnail of a browsed service from the local cache."""
+        service = self._dreambox.index.service(media_content_id)
+        if service is None:
+            return None, None
+        return await self.coordinator.picons.async_get(service, thumbnail=True)
+
+    async def async_set_volume_level(self, volume) -> None:
         """Set volume level, range 0..1."""
-        self._dreambox.volume = int(volume * 100)
+        await self._async_optimistic(
+            VERIFY_VOLUME,
+            {"_attr_volume_level": volume},
+            self._dreambox.async_set_volume,
+            volume * 100,
+        )
 
-    def volume_up(self) -> None:
+    async def async_volume_up(self) -> None:
         """Volume up the media player."""
-        self._dreambox.volumeUp()
+        await self._async_step(
+            self.coordinator.commands.async_volume_step, 1, VERIFY_VOLUME
+        )
 
-    def volume_down(self) -> None:
+    async def async_volume_down(self) -> None:
         """Volume down media player."""
-        self._dreambox.volumeDown()
+        await self._async_step(
+            self.coordinator.commands.async_volume_step, -1, VERIFY_VOLUME
+        )
 
-    def media_stop(self) -> None:
+    async def async_media_stop(self) -> None:
         """Send stop command."""
-        self._dreambox.stop()
+        await self._async_command(self._dreambox.async_stop)
 
-    def media_play_pause(self) -> None:
-        self._dreambox.tooglePlayPause()
+    async def async_media_play_pause(self) -> None:
+        await self._async_command(self._dreambox.async_toggle_play_pause)
 
-    def media_play(self) -> None:
+    async def async_media_play(self) -> None:
         """Play media."""
-        self._dreambox.tooglePlayPause()
+        await self._async_command(self._dreambox.async_toggle_play_pause)
 
-    def media_pause(self) -> None:
+    async def async_media_pause(self) -> None:
         """Pause the media player."""
-        self._dreambox.tooglePlayPause()
+        await self._async_command(self._dreambox.async_toggle_play_pause)
 
-    def media_next_track(self) -> None:
+    async def async_media_next_track(self) -> None:
         """Send next track command."""
-        self._dreambox.set_channel_up()
+        await self._async_step(
+            self.coordinator.commands.async_channel_step, 1, VERIFY_SERVICE
+        )
 
-    def media_previous_track(self) -> None:
+    async def async_media_previous_track(self) -> None:
         """Send next track command."""
-        self._dreambox.set_channel_down()
+        await self._async_step(
+            self.coordinator.commands.async_channel_step, -1, VERIFY_SERVICE
+        )
 
-    def mute_volume(self, mute) -> None:
+    async def async_mute_volume(self, mute) -> None:
         """Mute or unmute."""
-        self._dreambox.muted = mute
+        await self._async_optimistic(
+            VERIFY_VOLUME,
+            {"_attr_is_volume_muted": mute},
+            self._dreambox.async_set_muted,
+            mute,
+        )
+
+    def _browse_cached(self, key, builder, *args) -> "BrowseMedia":
+        """Return a browse tree node, built once per bouquet list revision."""
+        # thumbnail urls carry the access token, rebuild when it rotates
+        revision = (self._dreambox.index.revision, self.access_token)
+        if revision != self._browse_revision:
+            self._browse_cache = {}
+            self._browse_revision = revision
+        node = self._browse_cache.get(key)
+        if node is None:
+            node = self._browse_cache[key] = builder(*args)
+        return node
 
     def _browse_media_library(
         self, media_content_type, media_content_id
     ) -> "BrowseMedia":
         self._bouquet = None
+        return self._browse_cached("library", self._build_library)
+
+    def _build_library(self) -> "BrowseMedia":
         library_info = {
             "title": "Favorites",
             "media_class": MediaClass.DIRECTORY,
@@ -177,18 +362,30 @@ class DreamboxDevice(MediaPlayerEntity):
                 "children": [],
             }
             library_info["children"].append(BrowseMedia(**bouquet_info))
+        library_info["children"].append(
+            BrowseMedia(
+                title="Recordings",
+                media_class=MediaClass.DIRECTORY,
+                media_content_id=media_source.generate_media_source_id(
+                    DOMAIN, self.coordinator.config_entry.entry_id
+                ),
+                media_content_type=MediaType.VIDEO,
+                can_play=False,
+                can_expand=True,
+            )
+        )
         return BrowseMedia(**library_info)
 
     def _browse_media_bouquet(
         self, media_content_type, media_content_id
     ) -> "BrowseMedia":
-        bouquet = None
-        for b in self._dreambox.bouquets:
-            if b.ref == media_content_id:
-                bouquet = b
+        bouquet = self._dreambox.index.bouquet(media_content_id)
         if not bouquet:
             return None
         self._bouquet = bouquet
+        return self._browse_cached(bouquet.ref, self._build_bouquet, bouquet)
+
+    def _build_bouquet(self, bouquet) -> "BrowseMedia":
         bouquet_info = {
             "title": bouquet.name,
             "media_class": MediaClass.PLAYLIST,
@@ -199,67 +396,211 @@ class DreamboxDevice(MediaPlayerEntity):
             "can_expand": True,
             "children": [],
         }
-        for service in bouquet.services:
-            service_info = {
-                "title": service.name,
-                "media_class": MediaClass.VIDEO,
-                "media_content_id": service.ref,
-                "media_content_type": MediaType.TVSHOW,
-                "can_play": True,
-                "thumbnail": self._dreambox.picon(service),
-                "can_expand": False,
-            }
-            bouquet_info["children"].append(BrowseMedia(**service_info))
+        playable = self._dreambox.index.playable(bouquet.ref)
+        if len(playable) > BROWSE_PAGE_SIZE:
+            # too many channels for a single response, group them A-Z
+            bouquet_info["children_media_class"] = MediaClass.DIRECTORY
+            for bucket, services in self._dreambox.index.buckets(bouquet.ref).items():
+                bouquet_info["children"].append(
+                    self._page_node(bouquet, bucket, 0, f"{bucket} ({len(services)})")
+                )
+        else:
+            for service in playable:
+                bouquet_info["children"].append(self._service_node(service))
         response = BrowseMedia(**bouquet_info)
         return response
 
+    def _browse_media_page(self, media_content_type, media_content_id) -> "BrowseMedia":
+        bucket, page, ref = parse_page_id(media_content_id)
+        bouquet = self._dreambox.index.bouquet(ref)
+        if not bouquet or bucket not in self._dreambox.index.buckets(ref):
+            return None
+        self._bouquet = bouquet
+        return self._browse_cached(
+            (bucket, page, ref), self._build_page, bouquet, bucket, page
+        )
+
+    def _build_page(self, bouquet, bucket, page) -> "BrowseMedia":
+        services = self._dreambox.index.buckets(bouquet.ref)[bucket]
+        start = page * BROWSE_PAGE_SIZE
+        title = f"{bouquet.name} - {bucket}"
+        node = self._page_node(
+            bouquet, bucket, page, title if not page else f"{title} ({page + 1})"
+        )
+        node.children_media_class = MediaClass.VIDEO
+        node.children = [
+            self._service_node(service)
+            for service in services[start : start + BROWSE_PAGE_SIZE]
+        ]
+        if start + BROWSE_PAGE_SIZE < len(services):
+            node.children.append(
+                self._page_node(bouquet, bucket, page + 1, f"Page {page + 2}")
+            )
+        return node
+
+    @staticmethod
+    def _page_node(bouquet, bucket, page, title) -> "BrowseMedia":
+        return BrowseMedia(
+            title=title,
+            media_class=MediaClass.DIRECTORY,
+            media_content_id=page_id(bucket, page, bouquet.ref),
+            media_content_type=MEDIA_TYPE_BOUQUET_PAGE,
+            can_play=False,
+            can_expand=True,
+            children_media_class=MediaClass.VIDEO,
+        )
+
+    def _service_node(self, service) -> "BrowseMedia":
+        return BrowseMedia(
+            title=service.name,
+            media_class=MediaClass.VIDEO,
+            media_content_id=service.ref,
+            media_content_type=MediaType.TVSHOW,
+            can_play=True,
+            thumbnail=self._browse_thumbnail(service),
+            can_expand=False,
+        )
+
+    def _browse_thumbnail(self, service):
+        if self._dreambox.picon_path(service) is None:
+            return None
+        return self.get_browse_image_url(MediaType.TVSHOW, service.ref)
+
     async def async_browse_media(
         self, media_content_type: Optional[str], media_content_id: Optional[str]
     ) -> "BrowseMedia":
+        if media_content_id and media_source.is_media_source_id(media_content_id):
+            return await media_source.async_browse_media(self.hass, media_content_id)
         builder = None
         if media_content_type in [None, "library"]:
             builder = self._browse_media_library
         elif media_content_type == "bouquet":
             builder = self._browse_media_bouquet
+        elif media_content_type == MEDIA_TYPE_BOUQUET_PAGE:
+            builder = self._browse_media_page
         response = None
         if builder:
-            response = await self.hass.async_add_executor_job(
-                builder, media_content_type, media_content_id
-            )
+            response = builder(media_content_type, media_content_id)
         if response is None:
             raise BrowseError(
                 f"Media not found: {media_content_type} / {media_content_id}"
             )
         return response
 
-    def play_media(self, media_type: str, media_id: str, **kwargs) -> None:
-        if media_type != MediaType.TVSHOW or not self._bouquet:
+    async def async_search_media(self, query: "SearchMediaQuery") -> "SearchMedia":
+        """Search channels by name, within a bouquet if one is browsed."""
+        index = self._dreambox.index
+        bouquet_ref = None
+        if query.media_content_type == "bouquet" and index.bouquet(
+            query.media_content_id
+        ):
+            bouquet_ref = query.media_content_id
+        elif query.media_content_type == MEDIA_TYPE_BOUQUET_PAGE:
+            bouquet_ref = parse_page_id(query.media_content_id)[2]
+        services = index.search(query.search_query, bouquet_ref, SEARCH_LIMIT)
+        return SearchMedia(result=[self._service_node(s) for s in services])
+
+    async def async_play_media(self, media_type: str, media_id: str, **kwargs) -> None:
+        """Zap to a service given by reference or channel name."""
+        if media_source.is_media_source_id(media_id):
+            await self._async_play_media_source(media_id)
+            return
+        if media_type not in (MediaType.TVSHOW, MediaType.CHANNEL):
             raise MediaPlayerException(
                 f"Media not supported: {media_type} / {media_id}"
             )
-        for service in self._bouquet.services:
-            if service.ref == media_id:
-                self._dreambox.playService(service, self._bouquet)
-                return
-        raise MediaPlayerException(f"Channel not found: {media_type} / {media_id}")
+        preferred = [b.ref for b in (self._bouquet, self._dreambox.bouquet) if b]
+        service, bouquet = self._dreambox.index.resolve(media_id, preferred)
+        if service is None:
+            raise MediaPlayerException(f"Channel not found: {media_type} / {media_id}")
+        await self._async_optimistic(
+            VERIFY_SERVICE,
+            {
+                "_attr_media_content_id": service.ref,
+                "_attr_media_title": service.name,
+                "_attr_media_channel": service.name,
+                "_attr_media_series_title": None,
+            },
+            self._dreambox.async_play_service,
+            service,
+            bouquet,
+        )
 
-    def update(self) -> None:
-        """Update state of the media_player."""
-        self._dreambox.update()
+    async def _async_play_media_source(self, media_id):
+        item = media_source.MediaSourceItem.from_uri(self.hass, media_id, None)
+        entry_id, kind, path, _ = parse_identifier(item.identifier)
+        if item.domain != DOMAIN or entry_id != self.coordinator.config_entry.entry_id:
+            raise MediaPlayerException(f"Media not supported: {media_id}")
+        if kind == KIND_SERVICE:
+            await self.async_play_media(MediaType.CHANNEL, path)
+        elif kind == KIND_RECORDING:
+            await self._async_play_recording(path)
+        else:
+            raise MediaPlayerException(f"Media not playable: {media_id}")
+
+    async def _async_play_recording(self, filename):
+        cached = self.coordinator.recordings.recording(filename)
+        title = cached.title if cached else filename.rsplit("/", 1)[-1]
+        await self._async_optimistic(
+            VERIFY_SERVICE,
+            {
+                "_attr_media_content_id": None,
+                "_attr_media_title": title,
+                "_attr_media_channel": None,
+                "_attr_media_series_title": None,
+            },
+            self._dreambox.async_play_recording,
+            filename,
+        )
 
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Handle updated data from the coordinator.
+
+        The state is only written if anything the entity exposes changed.
+        """
+        self._update_attrs()
+        self._async_write_state_if_changed()
+
+    @callback
+    def _async_write_state_if_changed(self) -> None:
+        snapshot = self._snapshot()
+        if snapshot == self._last_snapshot:
+            return
+        self._last_snapshot = snapshot
+        self.async_write_ha_state()
+
+    def _snapshot(self):
+        return (
+            self.available,
+            self._attr_state,
+            self._attr_media_title,
+            self._attr_media_series_title,
+            self._attr_media_channel,
+            self._attr_media_content_id,
+            self._attr_media_duration,
+            self._attr_media_playlist,
+            self._attr_is_volume_muted,
+            self._attr_volume_level,
+            tuple(self._attr_extra_state_attributes.items()),
+        )
+
+    def _update_attrs(self) -> None:
+        """Update state of the media_player."""
+        current = self._dreambox.current
         if self._dreambox.standby:
             self._attr_state = MediaPlayerState.OFF
-        elif self._dreambox.current:
+        elif current:
             self._attr_state = MediaPlayerState.PLAYING
         else:
             self._attr_state = MediaPlayerState.ON
 
-        self._attr_available = self._dreambox.available
-        self._attr_media_title = self._dreambox.current.name
-        self._attr_media_series_title = self._dreambox.current.now.title
-        self._attr_media_channel = self._dreambox.current.name
-        self._attr_media_content_id = self._dreambox.current.ref
-        self._attr_media_duration = self._dreambox.current.now.duration or None
+        if current:
+            self._attr_media_title = current.name
+            self._attr_media_series_title = current.now.title
+            self._attr_media_channel = current.name
+            self._attr_media_content_id = current.ref
+            self._attr_media_duration = current.now.duration or None
         self._attr_is_volume_muted = self._dreambox.muted
         self._attr_volume_level = float(self._dreambox.volume) / 100.0
 
@@ -270,9 +611,16 @@ class DreamboxDevice(MediaPlayerEntity):
 
         if self._attr_state == MediaPlayerState.PLAYING:
             self._attr_extra_state_attributes = {
-                ATTR_MEDIA_DESCRIPTION: self._dreambox.current.now.title,
-                ATTR_MEDIA_START_TIME: self._dreambox.current.now.start,
-                ATTR_MEDIA_END_TIME: self._dreambox.current.now.end,
+                ATTR_MEDIA_DESCRIPTION: current.now.title,
+                ATTR_MEDIA_START_TIME: current.now.start,
+                ATTR_MEDIA_END_TIME: current.now.end,
+                # play this on any other media player to watch through HA
+                ATTR_MEDIA_STREAM: media_source.generate_media_source_id(
+                    DOMAIN,
+                    service_identifier(
+                        self.coordinator.config_entry.entry_id, current.ref
+                    ),
+                ),
             }
         else:
             self._attr_extra_state_attributes = {}
@@ -0,0 +1,173 @@
+"""Media source for the recordings of dreamboxes"""
+import re
+
+from homeassistant.components.media_player import BrowseError
+from homeassistant.components.media_player.const import MediaClass, MediaType
+from homeassistant.components.media_source import (
+    BrowseMediaSource,
+    MediaSource,
+    MediaSourceItem,
+    PlayMedia,
+    Unresolvable,
+)
+from homeassistant.core import HomeAssistant
+
+from .const import CONF_COORDINATORS, DOMAIN
+from .stream import STREAM_CONTENT_TYPE, stream_path
+
+RECORDINGS_PAGE_SIZE = 100
+
+KIND_DIRECTORY = "d"
+KIND_RECORDING = "r"
+KIND_SERVICE = "s"
+
+# <entry id>, <entry id>/d<page><directory>, <entry id>/r<file name>
+# or <entry id>/s<service reference>
+_IDENTIFIER = re.compile(
+    r"^(?P<entry>[^/]+)(?:/(?P<kind>[drs])(?P<page>\d*)(?P<path>(?<=s)[^/].*|/.*))?$"
+)
+
+
+def directory_identifier(entry_id, path, page=0):
+    return f"{entry_id}/{KIND_DIRECTORY}{page}{path}"
+
+
+def recording_identifier(entry_id, filename):
+    return f"{entry_id}/{KIND_RECORDING}{filename}"
+
+
+def service_identifier(entry_id, ref):
+    return f"{entry_id}/{KIND_SERVICE}{ref}"
+
+
+def parse_identifier(identifier):
+    """Return entry id, kind, path or service reference and page.
+
+    The kind is ``None`` for the identifier of a box itself.
+    """
+    match = _IDENTIFIER.match(identifier or "")
+    if match is None:
+        return None, None, None, 0
+    return match["entry"], match["kind"], match["path"], int(match["page"] or 0)
+
+
+async def async_get_media_source(hass: HomeAssistant):
+    """Set up the dreambox recordings media source."""
+    return DreamboxMediaSource(hass)
+
+
+class DreamboxMediaSource(MediaSource):
+    """Browse and play the recordings of all configured boxes.
+
+    Directories are listed lazily and in pages of ``RECORDINGS_PAGE_SIZE``
+    entries, played recordings are zapped to by the box's media player.
+    Other players are handed the stream proxy, which also serves live
+    services by reference.
+    """
+
+    name = "Dreambox recordings"
+
+    def __init__(self, hass: HomeAssistant):
+        super().__init__(DOMAIN)
+        self.hass = hass
+
+    @property
+    def _coordinators(self):
+        return self.hass.data.get(DOMAIN, {}).get(CONF_COORDINATORS, {})
+
+    async def async_resolve_media(self, item: MediaSourceItem) -> PlayMedia:
+        entry_id, kind, path, _ = parse_identifier(item.identifier)
+        if entry_id not in self._coordinators:
+            raise Unresolvable(f"Unknown dreambox: {entry_id}")
+        if kind == KIND_RECORDING:
+            return PlayMedia(stream_path(entry_id, filename=path), STREAM_CONTENT_TYPE)
+        if kind == KIND_SERVICE:
+            return PlayMedia(stream_path(entry_id, ref=path), STREAM_CONTENT_TYPE)
+        raise Unresolvable(f"Not playable: {item.identifier}")
+
+    async def async_browse_media(self, item: MediaSourceItem) -> BrowseMediaSource:
+        if not item.identifier:
+            return self._browse_boxes()
+        entry_id, kind, path, page = parse_identifier(item.identifier)
+        if entry_id is None or kind not in (None, KIND_DIRECTORY):
+            raise BrowseError(f"Unknown media: {item.identifier}")
+        coordinator = self._coordinators.get(entry_id)
+        if coordinator is None:
+            raise BrowseError(f"Unknown dreambox: {entry_id}")
+        if path is None:
+            locations = await coordinator.recordings.async_locations()
+            if len(locations) != 1:
+                return self._browse_locations(coordinator, entry_id, locations)
+            path = locations[0]
+        directory = await coordinator.recordings.async_directory(path)
+        if directory is None:
+            raise BrowseError(f"Failed to list {path} on {coordinator.name}")
+        return self._browse_directory(entry_id, directory, page)
+
+    def _browse_boxes(self):
+        return self._node(
+            None,
+            self.name,
+            [
+                self._node(entry_id, coordinator.name)
+                for entry_id, coordinator in self._coordinators.items()
+            ],
+        )
+
+    def _browse_locations(self, coordinator, entry_id, locations):
+        return self._node(
+            entry_id,
+            coordinator.name,
+            [
+                self._node(directory_identifier(entry_id, path), path)
+                for path in locations
+            ],
+        )
+
+    def _browse_directory(self, entry_id, directory, page):
+        entries = directory.directories + directory.recordings
+        start = page * RECORDINGS_PAGE_SIZE
+        children = []
+        for entry in entries[start : start + RECORDINGS_PAGE_SIZE]:
+            if isinstance(entry, str):
+                name = entry.rstrip("/").rsplit("/", 1)[-1]
+                children.append(self._node(directory_identifier(entry_id, entry), name))
+            else:
+                children.append(self._recording(entry_id, entry))
+        if start + RECORDINGS_PAGE_SIZE < len(entries):
+            children.append(
+                self._node(
+                    directory_identifier(entry_id, directory.path, page + 1),
+                    f"Page {page + 2}",
+                )
+            )
+        title = directory.name if not page else f"{directory.name} ({page + 1})"
+        return self._node(
+            directory_identifier(entry_id, directory.path, page), title, children
+        )
+
+    @staticmethod
+    def _node(identifier, title, children=None):
+        return BrowseMediaSource(
+            domain=DOMAIN,
+            identifier=identifier,
+            media_class=MediaClass.DIRECTORY,
+            media_content_type=MediaType.VIDEO,
+            title=title,
+            can_play=False,
+            can_expand=True,
+            children=children,
+            children_media_class=MediaClass.VIDEO if children else None,
+        )
+
+    @staticmethod
+    def _recording(entry_id, recording):
+        return BrowseMediaSource(
+            domain=DOMAIN,
+            identifier=recording_identifier(entry_id, recording.filename),
+            media_class=MediaClass.VIDEO,
+            media_content_type=STREAM_CONTENT_TYPE,
+            title=recording.title,
+            can_play=True,
+            can_expand=False,
+        )
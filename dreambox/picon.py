@@ -0,0 +1,242 @@
+"""Local cache for the picons of a dreambox"""
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+
+from aiohttp import hdrs
+
+try:
+    from PIL import Image
+except ImportError:  # thumbnails are optional
+    Image = None
+
+_LOGGER = logging.getLogger(__name__)
+
+PICON_CONTENT_TYPE = "image/png"
+PICON_MEMORY_CACHE_SIZE = 8 * 1024 * 1024
+PICON_DISK_CACHE_SIZE = 64 * 1024 * 1024
+PICON_REVALIDATE_INTERVAL = 24 * 60 * 60
+PICON_MISSING_RETRY_INTERVAL = 60 * 60
+THUMBNAIL_SIZE = (110, 66)
+
+
+class _Picon:
+    __slots__ = ("content", "content_type", "etag", "last_modified", "checked")
+
+    def __init__(
+        self, content, content_type=None, etag=None, last_modified=None, checked=0.0
+    ):
+        self.content = content
+        self.content_type = content_type or PICON_CONTENT_TYPE
+        self.etag = etag
+        self.last_modified = last_modified
+        self.checked = checked
+
+    @property
+    def fresh(self):
+        interval = (
+            PICON_REVALIDATE_INTERVAL if self.content else PICON_MISSING_RETRY_INTERVAL
+        )
+        return time.time() - self.checked < interval
+
+    def meta(self):
+        return {
+            "content_type": self.content_type,
+            "etag": self.etag,
+            "last_modified": self.last_modified,
+            "checked": self.checked,
+        }
+
+
+class PiconCache:
+    """Size bounded in-memory and on-disk LRU cache for picons.
+
+    Picons are keyed by their file name, which is derived from the
+    service reference. Cached picons are revalidated against the box with
+    ETag / Last-Modified once a day, concurrent requests for the same
+    picon share a single fetch. Downscaled thumbnails are generated if
+    Pillow is available.
+    """
+
+    def __init__(self, hass, client, directory):
+        self._hass = hass
+        self._client = client
+        self._directory = directory
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._disk = None
+        self._pending = {}
+
+    async def async_get(self, service, thumbnail=False):
+        """Return content and content type of the picon of a service."""
+        path = self._client.picon_path(service)
+        if path is None:
+            return None, None
+        picon = await self._async_picon(path)
+        if picon is None or not picon.content:
+            return None, None
+        if thumbnail and Image is not None:
+            picon = await self._async_thumbnail(path, picon)
+        return picon.content, picon.content_type
+
+    async def _async_picon(self, path):
+        picon = await self._async_lookup(path)
+        if picon is not None and picon.fresh:
+            return picon
+        task = self._pending.get(path)
+        if task is None:
+            task = self._hass.async_create_task(self._async_fetch(path, picon))
+            self._pending[path] = task
+            task.add_done_callback(lambda _: self._pending.pop(path, None))
+        return await asyncio.shield(task)
+
+    async def _async_fetch(self, path, cached):
+        etag = cached.etag if cached else None
+        last_modified = cached.last_modified if cached else None
+        status, headers, body = await self._client.async_get_file(
+            path, etag, last_modified
+        )
+        now = time.time()
+        if status == 304 and cached is not None:
+            cached.checked = now
+            await self._async_store(path, cached, content=False)
+            return cached
+        if status == 200 and body:
+            picon = _Picon(
+                body,
+                headers.get(hdrs.CONTENT_TYPE),
+                headers.get(hdrs.ETAG),
+                headers.get(hdrs.LAST_MODIFIED),
+                now,
+            )
+            await self._async_store(path, picon)
+            return picon
+        if status == 404:
+            picon = _Picon(b"", checked=now)
+            self._remember(path, picon)
+            return picon
+        # keep serving a stale copy while the box is unreachable
+        return cached
+
+    async def _async_thumbnail(self, path, picon):
+        key = self._thumbnail_key(path)
+        source = _digest(picon.content)
+        thumbnail = await self._async_lookup(key)
+        if thumbnail is not None and thumbnail.etag == source:
+            return thumbnail
+        content = await self._hass.async_add_executor_job(_scale, picon.content)
+        # the etag of a thumbnail is the digest of the picon it was made of
+        thumbnail = _Picon(content, PICON_CONTENT_TYPE, source, None, picon.checked)
+        await self._async_store(key, thumbnail)
+        return thumbnail
+
+    @staticmethod
+    def _thumbnail_key(path):
+        return f"{path}@thumbnail"
+
+    def _remember(self, key, picon):
+        self._drop(key)
+        self._memory[key] = picon
+        self._memory_size += len(picon.content)
+        while self._memory_size > PICON_MEMORY_CACHE_SIZE and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted.content)
+
+    def _drop(self, key):
+        picon = self._memory.pop(key, None)
+        if picon is not None:
+            self._memory_size -= len(picon.content)
+
+    async def _async_lookup(self, key):
+        picon = self._memory.get(key)
+        if picon is not None:
+            self._memory.move_to_end(key)
+            return picon
+        name = _digest(key.encode())
+        if self._disk is None:
+            self._disk = await self._hass.async_add_executor_job(self._scan)
+        if name not in self._disk:
+            return None
+        picon = await self._hass.async_add_executor_job(self._read, name)
+        if picon is None:
+            self._disk.pop(name, None)
+            return None
+        self._disk.move_to_end(name)
+        self._remember(key, picon)
+        return picon
+
+    async def _async_store(self, key, picon, content=True):
+        self._remember(key, picon)
+        name = _digest(key.encode())
+        if self._disk is None:
+            self._disk = await self._hass.async_add_executor_job(self._scan)
+        evict = []
+        if content:
+            self._disk[name] = len(picon.content)
+            self._disk.move_to_end(name)
+            usage = sum(self._disk.values())
+            while usage > PICON_DISK_CACHE_SIZE and len(self._disk) > 1:
+                evicted, size = self._disk.popitem(last=False)
+                usage -= size
+                evict.append(evicted)
+        await self._hass.async_add_executor_job(
+            self._write, name, picon, content, evict
+        )
+
+    def _scan(self):
+        entries = []
+        try:
+            with os.scandir(self._directory) as it:
+                for entry in it:
+                    if entry.name.endswith(".json"):
+                        continue
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.name, stat.st_size))
+        except FileNotFoundError:
+            pass
+        return OrderedDict((name, size) for _, name, size in sorted(entries))
+
+    def _read(self, name):
+        filename = os.path.join(self._directory, name)
+        try:
+            with open(f"{filename}.json", encoding="utf-8") as meta:
+                picon = _Picon(b"", **json.load(meta))
+            with open(filename, "rb") as content:
+                picon.content = content.read()
+        except (OSError, ValueError, TypeError):
+            return None
+        return picon
+
+    def _write(self, name, picon, content, evict):
+        os.makedirs(self._directory, exist_ok=True)
+        filename = os.path.join(self._directory, name)
+        try:
+            if content:
+                with open(filename, "wb") as out:
+                    out.write(picon.content)
+            with open(f"{filename}.json", "w", encoding="utf-8") as out:
+                json.dump(picon.meta(), out)
+            for evicted in evict:
+                evicted = os.path.join(self._directory, evicted)
+                for path in (evicted, f"{evicted}.json"):
+                    if os.path.exists(path):
+                        os.remove(path)
+        except OSError as e:
+            _LOGGER.warning(f"Failed to write picon cache: {e}")
+
+
+def _digest(content):
+    return hashlib.sha1(content).hexdigest()
+
+
+def _scale(content):
+    with Image.open(io.BytesIO(content)) as image:
+        image.thumbnail(THUMBNAIL_SIZE)
+        out = io.BytesIO()
+        image.save(out, format="PNG")
+        return out.getvalue()
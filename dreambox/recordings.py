@@ -0,0 +1,160 @@
+"""Cached recordings listing of dreamboxes"""
+import hashlib
+from collections import OrderedDict
+
+from .breaker import BoxUnavailable
+
+DEFAULT_MOVIE_PATH = "/media/hdd/movie/"
+RECORDING_REF = "1:0:0:0:0:0:0:0:0:0:"
+MAX_CACHED_DIRECTORIES = 64
+
+
+def _int(text):
+    try:
+        return int(text)
+    except (TypeError, ValueError):
+        return None
+
+
+def directory_path(path):
+    return path if path.endswith("/") else f"{path}/"
+
+
+def recording_ref(filename):
+    """Return the service reference playing a recorded file."""
+    return f"{RECORDING_REF}{filename}"
+
+
+class Recording:
+    """A single recording from the movie list."""
+
+    __slots__ = ("ref", "filename", "title", "description", "time", "length")
+
+    def __init__(self, ref, filename, title, description, time, length):
+        self.ref = ref
+        self.filename = filename
+        self.title = title
+        self.description = description
+        self.time = time
+        self.length = length
+
+    @classmethod
+    def from_xml(cls, element):
+        def text(tag):
+            value = element.findtext(tag)
+            return value.strip() if value else None
+
+        filename = text("e2filename")
+        if not filename:
+            return None
+        return cls(
+            text("e2servicereference") or recording_ref(filename),
+            filename,
+            text("e2title") or filename.rsplit("/", 1)[-1],
+            text("e2description"),
+            _int(text("e2time")),
+            text("e2length"),
+        )
+
+
+def parse_movies(root):
+    """Return the recordings of an ``e2movielist``."""
+    recordings = [Recording.from_xml(e) for e in root.iter("e2movie")]
+    recordings = [r for r in recordings if r is not None]
+    recordings.sort(key=lambda r: r.time or 0, reverse=True)
+    return recordings
+
+
+def parse_directory(root, path):
+    """Return the change token and the sub directories of a file listing.
+
+    The token is a digest of the names of all files in the directory, it
+    changes whenever a recording is added, removed or renamed.
+    """
+    path = directory_path(path)
+    names = []
+    directories = []
+    for element in root.iter("e2file"):
+        ref = (element.findtext("e2servicereference") or "").strip()
+        names.append(ref)
+        if element.findtext("e2isdirectory") == "True":
+            ref = directory_path(ref)
+            # skip the parent directory
+            if ref.startswith(path) and ref != path:
+                directories.append(ref)
+    token = hashlib.sha1("\n".join(sorted(names)).encode()).hexdigest()
+    return token, sorted(directories, key=str.casefold)
+
+
+class Directory:
+    """Listing of a single recordings directory."""
+
+    __slots__ = ("path", "token", "directories", "recordings")
+
+    def __init__(self, path, token, directories, recordings):
+        self.path = path
+        self.token = token
+        self.directories = directories
+        self.recordings = recordings
+
+    @property
+    def name(self):
+        return self.path.rstrip("/").rsplit("/", 1)[-1] or self.path
+
+
+class RecordingLibrary:
+    """Lazily loaded, cached directory listings of the recordings of a box.
+
+    Directories are only listed when browsed. The cheap file listing of a
+    directory is fetched on every browse; the expensive movie list, which
+    makes the box read the meta data of every recording, is only fetched
+    again if the names of the files in the directory changed.
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self._locations = None
+        self._directories = OrderedDict()
+
+    async def async_locations(self):
+        if self._locations is None:
+            try:
+                locations = await self._client.async_get_locations()
+            except BoxUnavailable:
+                locations = None
+            if locations is None:
+                return [DEFAULT_MOVIE_PATH]
+            self._locations = [directory_path(path) for path in locations] or [
+                DEFAULT_MOVIE_PATH
+            ]
+        return self._locations
+
+    async def async_directory(self, path):
+        """Return the listing of a directory, ``None`` if it can't be read."""
+        path = directory_path(path)
+        cached = self._directories.get(path)
+        try:
+            listing = await self._client.async_get_directory(path)
+            if listing is None:
+                return cached
+            token, directories = listing
+            if cached is None or cached.token != token:
+                recordings = await self._client.async_get_movies(path)
+                if recordings is None:
+                    return cached
+                cached = Directory(path, token, directories, recordings)
+        except BoxUnavailable:
+            # keep serving the cached listing while the box is unreachable
+            return cached
+        self._directories[path] = cached
+        self._directories.move_to_end(path)
+        while len(self._directories) > MAX_CACHED_DIRECTORIES:
+            self._directories.popitem(last=False)
+        return cached
+
+    def recording(self, filename):
+        """Return a cached recording by file name."""
+        directory = self._directories.get(directory_path(filename.rsplit("/", 1)[0]))
+        if directory is None:
+            return None
+        return next((r for r in directory.recordings if r.filename == filename), None)
@@ -0,0 +1,134 @@
+"""Remote control of dreamboxes"""
+from homeassistant.components.remote import (
+    ATTR_DELAY_SECS,
+    ATTR_NUM_REPEATS,
+    DEFAULT_NUM_REPEATS,
+    RemoteEntity,
+)
+from homeassistant.const import CONF_NAME
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .breaker import BoxUnavailable
+from .const import CONF_COORDINATORS, DOMAIN
+
+# the box queues keys itself, there is no need to wait between them
+DEFAULT_DELAY_SECS = 0
+
+# Enigma2 key codes, see linux/input.h
+KEYS = {
+    "power": 116,
+    "0": 11,
+    "1": 2,
+    "2": 3,
+    "3": 4,
+    "4": 5,
+    "5": 6,
+    "6": 7,
+    "7": 8,
+    "8": 9,
+    "9": 10,
+    "previous": 412,
+    "next": 407,
+    "red": 398,
+    "green": 399,
+    "yellow": 400,
+    "blue": 401,
+    "up": 103,
+    "down": 108,
+    "left": 105,
+    "right": 106,
+    "ok": 352,
+    "menu": 139,
+    "exit": 174,
+    "info": 358,
+    "epg": 365,
+    "help": 138,
+    "audio": 392,
+    "video": 393,
+    "text": 388,
+    "tv": 377,
+    "radio": 385,
+    "volume_up": 115,
+    "volume_down": 114,
+    "mute": 113,
+    "channel_up": 402,
+    "channel_down": 403,
+    "play_pause": 164,
+    "play": 207,
+    "pause": 119,
+    "stop": 128,
+    "record": 167,
+    "rewind": 168,
+    "fast_forward": 208,
+}
+
+
+def key_code(command):
+    """Return the key code of a key name or a numeric key code."""
+    command = command.strip().lower()
+    if command in KEYS:
+        return KEYS[command]
+    if command.isdigit():
+        return int(command)
+    return None
+
+
+async def async_setup_entry(hass, config_entry, async_add_entities):
+    coordinator = hass.data[DOMAIN][CONF_COORDINATORS][config_entry.entry_id]
+    async_add_entities([DreamboxRemote(config_entry.data[CONF_NAME], coordinator)])
+
+
+class DreamboxRemote(CoordinatorEntity, RemoteEntity):
+    """Remote control of an Enigma2 box.
+
+    A whole ``send_command`` call is a single command of the box's command
+    queue, its keys reach the box in order and back to back.
+    """
+
+    _attr_icon = "mdi:remote"
+
+    def __init__(self, name, coordinator):
+        super().__init__(coordinator)
+        mac = coordinator.api.mac
+        self._name = name
+        self._attr_name = name
+        self._attr_unique_id = f"{mac}_remote"
+        self._attr_device_info = DeviceInfo(identifiers={(DOMAIN, mac)})
+
+    @property
+    def is_on(self):
+        return not self.coordinator.api.standby
+
+    async def _async_command(self, func, *args):
+        try:
+            result = await self.coordinator.commands.async_run(func, *args)
+        except BoxUnavailable as err:
+            raise HomeAssistantError(f"{self._name} is not reachable") from err
+        self.coordinator.async_fast_poll()
+        return result
+
+    async def async_turn_on(self, **kwargs):
+        await self._async_command(self.coordinator.api.async_set_standby, False)
+
+    async def async_turn_off(self, **kwargs):
+        await self._async_command(self.coordinator.api.async_set_standby, True)
+
+    async def async_send_command(self, command, **kwargs):
+        """Send a sequence of keys by name or key code."""
+        codes = []
+        for key in command:
+            code = key_code(key)
+            if code is None:
+                raise HomeAssistantError(f"Unknown key: {key}")
+            codes.append(code)
+        codes *= kwargs.get(ATTR_NUM_REPEATS, DEFAULT_NUM_REPEATS)
+        delay = kwargs.get(ATTR_DELAY_SECS, DEFAULT_DELAY_SECS)
+        sent = await self._async_command(
+            self.coordinator.api.async_send_keys, codes, delay
+        )
+        if sent < len(codes):
+            raise HomeAssistantError(
+                f"{self._name} accepted {sent} of {len(codes)} keys"
+            )
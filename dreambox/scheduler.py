@@ -0,0 +1,96 @@
+"""Domain wide poll scheduling for dreamboxes"""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from datetime import timedelta
+
+from .stats import EndpointStats
+
+_LOGGER = logging.getLogger(__name__)
+
+MAX_CONCURRENT_POLLS = 4
+
+
+class PollScheduler:
+    """Spread the polls of all boxes over their interval.
+
+    Every box gets a phase within the poll interval depending on its
+    position among the registered boxes, so that boxes set up at the
+    same time do not poll in lockstep. At most ``MAX_CONCURRENT_POLLS``
+    poll cycles run at once, the others wait for a free slot.
+    """
+
+    def __init__(self, hass, limit=MAX_CONCURRENT_POLLS):
+        self._hass = hass
+        self._semaphore = asyncio.Semaphore(limit)
+        self._limit = limit
+        self._boxes = []
+        self._waiting = 0
+        self._running = 0
+        self._wait = EndpointStats()
+
+    @property
+    def queue_depth(self):
+        return self._waiting
+
+    @property
+    def wait(self):
+        return self._wait
+
+    def register(self, key):
+        if key not in self._boxes:
+            self._boxes.append(key)
+
+    def unregister(self, key):
+        if key in self._boxes:
+            self._boxes.remove(key)
+
+    def phase(self, key, interval: timedelta):
+        """Return the offset of a box within the poll interval in seconds."""
+        if key not in self._boxes:
+            return 0.0
+        return interval.total_seconds() * self._boxes.index(key) / len(self._boxes)
+
+    def align(self, key, interval: timedelta):
+        """Return the delay that moves the next poll of a box onto its phase.
+
+        The delay is within half an interval of the nominal ``interval``.
+        """
+        seconds = interval.total_seconds()
+        if len(self._boxes) < 2 or seconds <= 0:
+            return interval
+        target = self._hass.loop.time() + seconds
+        shift = (target - self.phase(key, interval)) % seconds
+        if shift > seconds / 2:
+            shift -= seconds
+        return timedelta(seconds=seconds - shift)
+
+    @asynccontextmanager
+    async def async_slot(self, key):
+        """Wait for a free poll slot and hold it while polling."""
+        loop = self._hass.loop
+        queued = loop.time()
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        waited = loop.time() - queued
+        self._wait.record(waited)
+        if waited > 1:
+            _LOGGER.debug(f"Poll of {key} waited {waited:.1f}s for a free slot")
+        self._running += 1
+        try:
+            yield
+        finally:
+            self._running -= 1
+            self._semaphore.release()
+
+    def as_dict(self):
+        return {
+            "boxes": len(self._boxes),
+            "limit": self._limit,
+            "running": self._running,
+            "queue_depth": self._waiting,
+            "wait": self._wait.as_dict(),
+        }
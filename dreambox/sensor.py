@@ -0,0 +1,231 @@
+"""Sensors for dreamboxes"""
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorStateClass,
+)
+from homeassistant.const import (
+    CONF_NAME,
+    PERCENTAGE,
+    EntityCategory,
+    UnitOfInformation,
+    UnitOfTime,
+)
+from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.util import dt as dt_util
+
+from .bouquets import is_playable
+from .const import CONF_COORDINATORS, DOMAIN
+from .health import GROUP_SIGNAL, GROUP_STORAGE, GROUP_SYSTEM, HealthEntity
+from .stats import ENDPOINT_POLL
+
+ATTR_CAPACITY = "capacity"
+ATTR_DESCRIPTION = "description"
+ATTR_DISKS = "disks"
+ATTR_END_TIME = "end_time"
+ATTR_LOAD_5 = "load_5"
+ATTR_LOAD_15 = "load_15"
+ATTR_NEXT_START_TIME = "next_start_time"
+ATTR_NEXT_TITLE = "next_title"
+ATTR_START_TIME = "start_time"
+
+MAX_EPG_SENSORS = 100
+
+
+async def async_setup_entry(hass, config_entry, async_add_entities):
+    coordinator = hass.data[DOMAIN][CONF_COORDINATORS][config_entry.entry_id]
+    name = config_entry.data[CONF_NAME]
+    entities = [
+        PollLatencySensor(name, coordinator, "last", None),
+        PollLatencySensor(name, coordinator, "p95", 95),
+        SnrSensor(name, coordinator),
+        SignalQualitySensor(name, coordinator),
+        DiskFreeSensor(name, coordinator),
+        CpuLoadSensor(name, coordinator),
+        LastBootSensor(name, coordinator),
+    ]
+    bouquet = coordinator.api.bouquet
+    if bouquet is not None:
+        services = [s for s in bouquet.services if is_playable(s.ref)]
+        entities.extend(
+            EpgSensor(name, coordinator, service)
+            for service in services[:MAX_EPG_SENSORS]
+        )
+    async_add_entities(entities)
+
+
+class PollLatencySensor(CoordinatorEntity, SensorEntity):
+    """Latency of the poll cycles of a box.
+
+    Either the latency of the last successful poll or a percentile over
+    the recent polls.
+    """
+
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_suggested_display_precision = 0
+
+    def __init__(self, name, coordinator, kind, percentile):
+        super().__init__(coordinator)
+        mac = coordinator.api.mac
+        self._percentile = percentile
+        self._attr_name = f"{name} {kind} poll latency"
+        self._attr_unique_id = f"{mac}_{kind}_poll_latency"
+        self._attr_device_info = DeviceInfo(identifiers={(DOMAIN, mac)})
+
+    @property
+    def available(self) -> bool:
+        return self.native_value is not None
+
+    @property
+    def native_value(self):
+        stats = self.coordinator.api.stats[ENDPOINT_POLL]
+        if self._percentile is None:
+            latency = stats.last
+        else:
+            latency = stats.percentile(self._percentile)
+        if latency is None:
+            return None
+        return latency * 1000
+
+
+def _timestamp(value):
+    if value is None:
+        return None
+    return dt_util.utc_from_timestamp(value).isoformat()
+
+
+class EpgSensor(CoordinatorEntity, SensorEntity):
+    """Now and next programme of a favourite channel.
+
+    Served from the EPG cache of the coordinator, the sensor never talks
+    to the box itself.
+    """
+
+    _attr_entity_registry_enabled_default = False
+    _attr_icon = "mdi:television-guide"
+    _unrecorded_attributes = frozenset({ATTR_DESCRIPTION})
+
+    def __init__(self, name, coordinator, service):
+        super().__init__(coordinator)
+        mac = coordinator.api.mac
+        self._ref = service.ref
+        self._attr_name = f"{name} {service.name}"
+        self._attr_unique_id = f"{mac}_epg_{service.ref}"
+        self._attr_device_info = DeviceInfo(identifiers={(DOMAIN, mac)})
+
+    @property
+    def available(self) -> bool:
+        return self.coordinator.epg.now(self._ref) is not None
+
+    @property
+    def native_value(self):
+        now = self.coordinator.epg.now(self._ref)
+        return now.title if now else None
+
+    @property
+    def extra_state_attributes(self):
+        now = self.coordinator.epg.now(self._ref)
+        if now is None:
+            return None
+        upcoming = self.coordinator.epg.next(self._ref)
+        return {
+            ATTR_START_TIME: _timestamp(now.start),
+            ATTR_END_TIME: _timestamp(now.end),
+            ATTR_DESCRIPTION: now.description,
+            ATTR_NEXT_TITLE: upcoming.title if upcoming else None,
+            ATTR_NEXT_START_TIME: _timestamp(upcoming.start) if upcoming else None,
+        }
+
+
+class HealthSensor(HealthEntity, SensorEntity):
+    """A value of the shared health status of a box."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    @property
+    def native_value(self):
+        return self._value
+
+
+class SnrSensor(HealthSensor):
+    """Signal to noise ratio of the tuner in use."""
+
+    group = GROUP_SIGNAL
+    key = "snr_db"
+    label = "SNR"
+    _attr_icon = "mdi:signal"
+    _attr_native_unit_of_measurement = "dB"
+    _attr_suggested_display_precision = 1
+
+
+class SignalQualitySensor(HealthSensor):
+    """Signal quality of the tuner in use."""
+
+    group = GROUP_SIGNAL
+    key = "snr"
+    label = "signal quality"
+    _attr_entity_registry_enabled_default = False
+    _attr_icon = "mdi:signal"
+    _attr_native_unit_of_measurement = PERCENTAGE
+
+
+class DiskFreeSensor(HealthSensor):
+    """Free space on all disks of a box."""
+
+    group = GROUP_STORAGE
+    key = "free"
+    label = "disk free"
+    _attr_device_class = SensorDeviceClass.DATA_SIZE
+    _attr_icon = "mdi:harddisk"
+    _attr_native_unit_of_measurement = UnitOfInformation.GIGABYTES
+    _attr_suggested_display_precision = 1
+
+    @property
+    def extra_state_attributes(self):
+        values = self._values
+        if not values:
+            return None
+        return {
+            ATTR_CAPACITY: values["capacity"],
+            ATTR_DISKS: [hdd["model"] for hdd in values["hdds"]],
+        }
+
+
+class CpuLoadSensor(HealthSensor):
+    """One minute load average of a box."""
+
+    group = GROUP_SYSTEM
+    key = "load_1"
+    label = "CPU load"
+    _attr_icon = "mdi:cpu-64-bit"
+    _attr_suggested_display_precision = 2
+
+    @property
+    def extra_state_attributes(self):
+        values = self._values
+        if not values:
+            return None
+        return {ATTR_LOAD_5: values["load_5"], ATTR_LOAD_15: values["load_15"]}
+
+
+class LastBootSensor(HealthSensor):
+    """Time a box was last booted."""
+
+    group = GROUP_SYSTEM
+    key = "boot_time"
+    label = "last boot"
+    _attr_device_class = SensorDeviceClass.TIMESTAMP
+    _attr_state_class = None
+
+    @property
+    def native_value(self):
+        boot_time = self._value
+        if boot_time is None:
+            return None
+        return dt_util.utc_from_timestamp(boot_time).replace(microsecond=0)
@@ -0,0 +1,405 @@
+"""Services of the dreambox integration"""
+import asyncio
+import logging
+from functools import partial
+
+import homeassistant.helpers.config_validation as cv
+import voluptuous as vol
+from homeassistant.const import CONF_NAME, CONF_TIMEOUT
+from homeassistant.core import HomeAssistant, ServiceCall, SupportsResponse
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.util import dt as dt_util
+
+from .breaker import BoxUnavailable
+from .client import AuthenticationFailed
+from .const import CONF_COORDINATORS, DOMAIN
+from .remote import key_code
+from .timers import Timer
+
+_LOGGER = logging.getLogger(__name__)
+
+SERVICE_ADD_TIMER = "add_timer"
+SERVICE_BROADCAST = "broadcast"
+SERVICE_DELETE_TIMER = "delete_timer"
+SERVICE_LIST_TIMERS = "list_timers"
+SERVICE_MODIFY_TIMER = "modify_timer"
+SERVICE_SYNC_TIMERS = "sync_timers"
+
+ATTR_CHANNEL = "channel"
+ATTR_COMMAND = "command"
+ATTR_CONFIG_ENTRY_ID = "config_entry_id"
+ATTR_DELETE_MISSING = "delete_missing"
+ATTR_DESCRIPTION = "description"
+ATTR_DIRNAME = "dirname"
+ATTR_DISABLED = "disabled"
+ATTR_END = "end"
+ATTR_JUSTPLAY = "justplay"
+ATTR_KEYS = "keys"
+ATTR_NEW_END = "new_end"
+ATTR_NEW_START = "new_start"
+ATTR_START = "start"
+ATTR_TIMERS = "timers"
+ATTR_VOLUME = "volume"
+
+COMMAND_KEYS = "keys"
+COMMAND_MUTE = "mute"
+COMMAND_STANDBY = "standby"
+COMMAND_UNMUTE = "unmute"
+COMMAND_VOLUME = "volume"
+COMMAND_WAKEUP = "wakeup"
+COMMAND_ZAP = "zap"
+
+BROADCAST_TIMEOUT = 10
+
+# the argument a command needs, if any
+COMMAND_ARGUMENTS = {
+    COMMAND_KEYS: ATTR_KEYS,
+    COMMAND_VOLUME: ATTR_VOLUME,
+    COMMAND_ZAP: ATTR_CHANNEL,
+}
+
+
+def _valid_keys(keys):
+    for key in keys:
+        if key_code(key) is None:
+            raise vol.Invalid(f"Unknown key: {key}")
+    return keys
+
+
+def _has_argument(data):
+    argument = COMMAND_ARGUMENTS.get(data[ATTR_COMMAND])
+    if argument is not None and argument not in data:
+        raise vol.Invalid(f"{data[ATTR_COMMAND]} needs {argument}")
+    return data
+
+
+BROADCAST_SCHEMA = vol.All(
+    vol.Schema(
+        {
+            vol.Required(ATTR_COMMAND): vol.In(
+                [
+                    COMMAND_KEYS,
+                    COMMAND_MUTE,
+                    COMMAND_STANDBY,
+                    COMMAND_UNMUTE,
+                    COMMAND_VOLUME,
+                    COMMAND_WAKEUP,
+                    COMMAND_ZAP,
+                ]
+            ),
+            vol.Optional(ATTR_CONFIG_ENTRY_ID): vol.All(cv.ensure_list, [cv.string]),
+            vol.Optional(ATTR_CHANNEL): cv.string,
+            vol.Optional(ATTR_KEYS): vol.All(cv.ensure_list, [cv.string], _valid_keys),
+            vol.Optional(ATTR_VOLUME): vol.All(
+                vol.Coerce(int), vol.Range(min=0, max=100)
+            ),
+            vol.Optional(CONF_TIMEOUT, default=BROADCAST_TIMEOUT): vol.All(
+                vol.Coerce(float), vol.Range(min=1, max=60)
+            ),
+        }
+    ),
+    _has_argument,
+)
+
+
+# naive times are in the time zone configured in Home Assistant
+_DATETIME = vol.All(cv.datetime, dt_util.as_utc)
+
+
+def _valid_span(data):
+    if data[ATTR_END] <= data[ATTR_START]:
+        raise vol.Invalid("end must be after start")
+    return data
+
+
+TIMER_KEY = {
+    vol.Required(ATTR_CHANNEL): cv.string,
+    vol.Required(ATTR_START): _DATETIME,
+    vol.Required(ATTR_END): _DATETIME,
+}
+
+TIMER_FIELDS = {
+    vol.Optional(CONF_NAME): cv.string,
+    vol.Optional(ATTR_DESCRIPTION): cv.string,
+    vol.Optional(ATTR_DIRNAME): cv.string,
+    vol.Optional(ATTR_DISABLED): cv.boolean,
+    vol.Optional(ATTR_JUSTPLAY): cv.boolean,
+}
+
+ENTRY_SCHEMA = vol.Schema({vol.Required(ATTR_CONFIG_ENTRY_ID): cv.string})
+
+TIMER_SCHEMA = vol.All(ENTRY_SCHEMA.extend({**TIMER_KEY, **TIMER_FIELDS}), _valid_span)
+
+DELETE_TIMER_SCHEMA = vol.All(ENTRY_SCHEMA.extend(TIMER_KEY), _valid_span)
+
+MODIFY_TIMER_SCHEMA = vol.All(
+    ENTRY_SCHEMA.extend(
+        {
+            **TIMER_KEY,
+            **TIMER_FIELDS,
+            vol.Optional(ATTR_NEW_START): _DATETIME,
+            vol.Optional(ATTR_NEW_END): _DATETIME,
+        }
+    ),
+    _valid_span,
+)
+
+SYNC_TIMERS_SCHEMA = ENTRY_SCHEMA.extend(
+    {
+        vol.Required(ATTR_TIMERS): vol.All(
+            cv.ensure_list,
+            [vol.All(vol.Schema({**TIMER_KEY, **TIMER_FIELDS}), _valid_span)],
+        ),
+        vol.Optional(ATTR_DELETE_MISSING, default=True): cv.boolean,
+    }
+)
+
+
+async def _async_standby(client, data):
+    await client.async_set_standby(True)
+
+
+async def _async_wakeup(client, data):
+    await client.async_set_standby(False)
+
+
+async def _async_mute(client, data):
+    await client.async_set_muted(True)
+
+
+async def _async_unmute(client, data):
+    await client.async_set_muted(False)
+
+
+async def _async_volume(client, data):
+    await client.async_set_volume(data[ATTR_VOLUME])
+
+
+async def _async_zap(client, data):
+    preferred = [client.bouquet.ref] if client.bouquet else []
+    service, bouquet = client.index.resolve(data[ATTR_CHANNEL], preferred)
+    if service is None:
+        return f"Channel not found: {data[ATTR_CHANNEL]}"
+    result = await client.async_play_service(service, bouquet)
+    if result is not None and not result.state:
+        return result.text
+
+
+async def _async_keys(client, data):
+    codes = [key_code(key) for key in data[ATTR_KEYS]]
+    sent = await client.async_send_keys(codes)
+    if sent < len(codes):
+        return f"Sent {sent} of {len(codes)} keys"
+
+
+COMMANDS = {
+    COMMAND_KEYS: _async_keys,
+    COMMAND_MUTE: _async_mute,
+    COMMAND_STANDBY: _async_standby,
+    COMMAND_UNMUTE: _async_unmute,
+    COMMAND_VOLUME: _async_volume,
+    COMMAND_WAKEUP: _async_wakeup,
+    COMMAND_ZAP: _async_zap,
+}
+
+
+async def _async_send(coordinator, data):
+    """Run a command on a single box and return its result."""
+    client = coordinator.api
+    command = COMMANDS[data[ATTR_COMMAND]]
+    try:
+        error = await asyncio.wait_for(
+            coordinator.commands.async_run(command, client, data), data[CONF_TIMEOUT]
+        )
+    except asyncio.TimeoutError:
+        error = f"No answer within {data[CONF_TIMEOUT]:g}s"
+    except BoxUnavailable as err:
+        error = str(err)
+    except AuthenticationFailed:
+        error = "Authentication failed"
+    else:
+        if error is None and not client.available:
+            error = "Connection failed"
+        coordinator.async_fast_poll()
+    if error is not None:
+        _LOGGER.warning(f"{data[ATTR_COMMAND]} failed on {coordinator.name}: {error}")
+    return {"name": coordinator.name, "success": error is None, "error": error}
+
+
+async def _async_broadcast(hass: HomeAssistant, call: ServiceCall):
+    """Send one command to several boxes at the same time.
+
+    Every box is given ``timeout`` seconds on its own, so the call takes
+    as long as the slowest box. The result of each box is returned by
+    config entry id.
+    """
+    coordinators = hass.data[DOMAIN][CONF_COORDINATORS]
+    entry_ids = call.data.get(ATTR_CONFIG_ENTRY_ID) or list(coordinators)
+    unknown = [entry_id for entry_id in entry_ids if entry_id not in coordinators]
+    if unknown:
+        raise HomeAssistantError(f"Unknown dreambox: {', '.join(unknown)}")
+    results = await asyncio.gather(
+        *(_async_send(coordinators[entry_id], call.data) for entry_id in entry_ids)
+    )
+    return {"results": dict(zip(entry_ids, results))}
+
+
+def _coordinator(hass, data):
+    coordinator = hass.data[DOMAIN][CONF_COORDINATORS].get(data[ATTR_CONFIG_ENTRY_ID])
+    if coordinator is None:
+        raise HomeAssistantError(f"Unknown dreambox: {data[ATTR_CONFIG_ENTRY_ID]}")
+    return coordinator
+
+
+def _timestamp(value):
+    return int(dt_util.as_utc(value).timestamp())
+
+
+def _timer(client, data):
+    """Return the timer described by service call data."""
+    preferred = [client.bouquet.ref] if client.bouquet else []
+    service, _ = client.index.resolve(data[ATTR_CHANNEL], preferred)
+    if service is None:
+        raise HomeAssistantError(f"Channel not found: {data[ATTR_CHANNEL]}")
+    return Timer(
+        service.ref,
+        _timestamp(data[ATTR_START]),
+        _timestamp(data[ATTR_END]),
+        name=data.get(CONF_NAME),
+        description=data.get(ATTR_DESCRIPTION),
+        disabled=data.get(ATTR_DISABLED),
+        justplay=data.get(ATTR_JUSTPLAY),
+        dirname=data.get(ATTR_DIRNAME),
+        service_name=service.name,
+    )
+
+
+async def _async_timer_command(coordinator, func, *args):
+    """Run a timer change in order with the other commands of the box."""
+    try:
+        return await coordinator.commands.async_run(func, *args)
+    except BoxUnavailable as err:
+        raise HomeAssistantError(f"{coordinator.name} is not reachable") from err
+
+
+async def _async_existing_timer(coordinator, timer):
+    timers = await coordinator.timers.async_timers()
+    if timers is None:
+        raise HomeAssistantError(f"Failed to fetch the timers of {coordinator.name}")
+    existing = next((t for t in timers if t.key == timer.key), None)
+    if existing is None:
+        raise HomeAssistantError(f"No such timer on {coordinator.name}")
+    return existing
+
+
+async def _async_list_timers(hass: HomeAssistant, call: ServiceCall):
+    """Return the timers of a box, from the cache if it is recent."""
+    coordinator = _coordinator(hass, call.data)
+    timers = await coordinator.timers.async_timers()
+    if timers is None:
+        raise HomeAssistantError(f"Failed to fetch the timers of {coordinator.name}")
+    return {
+        "revision": coordinator.timers.revision,
+        "timers": [timer.as_dict() for timer in timers],
+    }
+
+
+async def _async_add_timer(hass: HomeAssistant, call: ServiceCall):
+    coordinator = _coordinator(hass, call.data)
+    timer = _timer(coordinator.api, call.data)
+    error = await _async_timer_command(coordinator, coordinator.timers.async_add, timer)
+    if error:
+        raise HomeAssistantError(f"Adding the timer failed: {error}")
+
+
+async def _async_modify_timer(hass: HomeAssistant, call: ServiceCall):
+    coordinator = _coordinator(hass, call.data)
+    changes = _timer(coordinator.api, call.data)
+    existing = await _async_existing_timer(coordinator, changes)
+    timer = changes.merged(existing)
+    if ATTR_NEW_START in call.data:
+        timer.begin = _timestamp(call.data[ATTR_NEW_START])
+    if ATTR_NEW_END in call.data:
+        timer.end = _timestamp(call.data[ATTR_NEW_END])
+    if timer.end <= timer.begin:
+        raise HomeAssistantError("The timer would end before it starts")
+    error = await _async_timer_command(
+        coordinator, coordinator.timers.async_change, existing, timer
+    )
+    if error:
+        raise HomeAssistantError(f"Changing the timer failed: {error}")
+
+
+async def _async_delete_timer(hass: HomeAssistant, call: ServiceCall):
+    coordinator = _coordinator(hass, call.data)
+    timer = _timer(coordinator.api, call.data)
+    error = await _async_timer_command(
+        coordinator, coordinator.timers.async_delete, timer
+    )
+    if error:
+        raise HomeAssistantError(f"Deleting the timer failed: {error}")
+
+
+async def _async_sync_timers(hass: HomeAssistant, call: ServiceCall):
+    """Make the timers of a box match the given timers.
+
+    Only the differences are sent. Upcoming timers missing from the call
+    are deleted unless ``delete_missing`` is off.
+    """
+    coordinator = _coordinator(hass, call.data)
+    desired = [_timer(coordinator.api, data) for data in call.data[ATTR_TIMERS]]
+    plan, errors = await _async_timer_command(
+        coordinator,
+        coordinator.timers.async_sync,
+        desired,
+        call.data[ATTR_DELETE_MISSING],
+    )
+    if plan is None:
+        raise HomeAssistantError(f"Failed to fetch the timers of {coordinator.name}")
+    return {
+        "added": len(plan.add),
+        "changed": len(plan.change),
+        "deleted": len(plan.delete),
+        "unchanged": plan.unchanged,
+        "errors": errors,
+    }
+
+
+def async_setup_services(hass: HomeAssistant):
+    """Register the services of the integration."""
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_BROADCAST,
+        partial(_async_broadcast, hass),
+        schema=BROADCAST_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_LIST_TIMERS,
+        partial(_async_list_timers, hass),
+        schema=ENTRY_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+    hass.services.async_register(
+        DOMAIN, SERVICE_ADD_TIMER, partial(_async_add_timer, hass), schema=TIMER_SCHEMA
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_MODIFY_TIMER,
+        partial(_async_modify_timer, hass),
+        schema=MODIFY_TIMER_SCHEMA,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_DELETE_TIMER,
+        partial(_async_delete_timer, hass),
+        schema=DELETE_TIMER_SCHEMA,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_SYNC_TIMERS,
+        partial(_async_sync_timers, hass),
+        schema=SYNC_TIMERS_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
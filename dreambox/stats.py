@@ -0,0 +1,87 @@
+"""Request timing statistics for dreamboxes"""
+import time
+from collections import Counter, deque
+
+STATS_SAMPLES = 100
+
+ENDPOINT_POLL = "poll"
+
+CAUSE_AUTH = "auth"
+CAUSE_CONNECTION = "connection"
+CAUSE_PARSE = "parse"
+CAUSE_TIMEOUT = "timeout"
+CAUSE_UNAVAILABLE = "unavailable"
+
+
+def http_cause(status):
+    return f"http_{status}"
+
+
+class EndpointStats:
+    """Counts, latencies and failures of a single endpoint."""
+
+    __slots__ = ("count", "failures", "samples", "last", "last_time")
+
+    def __init__(self):
+        self.count = 0
+        self.failures = Counter()
+        self.samples = deque(maxlen=STATS_SAMPLES)
+        self.last = None
+        self.last_time = None
+
+    def record(self, elapsed, cause=None):
+        self.count += 1
+        self.last_time = time.time()
+        if cause is not None:
+            self.failures[cause] += 1
+        if elapsed is not None:
+            self.last = elapsed
+            self.samples.append(elapsed)
+
+    def percentile(self, percent):
+        """Return the given percentile of the recent latencies in seconds."""
+        if not self.samples:
+            return None
+        samples = sorted(self.samples)
+        return samples[min(len(samples) - 1, int(len(samples) * percent / 100))]
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "failures": dict(self.failures),
+            "last_ms": _ms(self.last),
+            "median_ms": _ms(self.percentile(50)),
+            "p95_ms": _ms(self.percentile(95)),
+            "max_ms": _ms(max(self.samples, default=None)),
+            "last_time": self.last_time,
+        }
+
+
+class RequestStats:
+    """Timing statistics of all requests made to a single box.
+
+    Only the last ``STATS_SAMPLES`` latencies are kept per endpoint,
+    counts and failures broken down by cause cover the whole uptime.
+    """
+
+    def __init__(self):
+        self._endpoints = {}
+
+    def __getitem__(self, endpoint):
+        stats = self._endpoints.get(endpoint)
+        if stats is None:
+            stats = self._endpoints[endpoint] = EndpointStats()
+        return stats
+
+    def record(self, endpoint, elapsed, cause=None):
+        self[endpoint].record(elapsed, cause)
+
+    def as_dict(self):
+        return {
+            endpoint: stats.as_dict()
+            for endpoint, stats in sorted(self._endpoints.items())
+        }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
@@ -0,0 +1,96 @@
+"""Live TV stream proxy for dreamboxes"""
+import asyncio
+import logging
+from urllib.parse import urlencode
+
+import aiohttp
+from aiohttp import hdrs, web
+from homeassistant.components.http import HomeAssistantView
+
+from .breaker import BoxUnavailable
+from .const import CONF_COORDINATORS, DOMAIN
+from .recordings import recording_ref
+
+_LOGGER = logging.getLogger(__name__)
+
+STREAM_CHUNK_SIZE = 64 * 1024
+STREAM_CONTENT_TYPE = "video/mp2t"
+MAX_VIEWERS_PER_BOX = 2
+
+
+def stream_path(entry_id, ref=None, filename=None):
+    """Return the path a service or recording is proxied at."""
+    query = {"file": filename} if filename else {"ref": ref}
+    return f"/api/{DOMAIN}/{entry_id}/stream?{urlencode(query)}"
+
+
+class DreamboxStreamView(HomeAssistantView):
+    """Proxy the transport stream of a service or recording.
+
+    The stream is passed through chunk by chunk. Writing to a slow client
+    waits for its buffer to drain, which pauses reading from the box, so
+    memory per viewer is bounded by the socket buffers and a single chunk
+    however long the stream runs. At most ``MAX_VIEWERS_PER_BOX`` streams
+    are proxied per box, the tuners of a box are limited as well.
+    """
+
+    url = "/api/dreambox/{entry_id}/stream"
+    name = "api:dreambox:stream"
+
+    def __init__(self, hass):
+        self.hass = hass
+        self._viewers = {}
+
+    async def get(self, request: web.Request, entry_id: str) -> web.StreamResponse:
+        coordinators = self.hass.data.get(DOMAIN, {}).get(CONF_COORDINATORS, {})
+        coordinator = coordinators.get(entry_id)
+        if coordinator is None:
+            raise web.HTTPNotFound()
+        if "file" in request.query:
+            ref = recording_ref(request.query["file"])
+        elif "ref" in request.query:
+            ref = request.query["ref"]
+        else:
+            raise web.HTTPBadRequest()
+        if self._viewers.get(entry_id, 0) >= MAX_VIEWERS_PER_BOX:
+            raise web.HTTPServiceUnavailable(
+                text=f"{coordinator.name} already streams to "
+                f"{MAX_VIEWERS_PER_BOX} viewers"
+            )
+
+        self._viewers[entry_id] = self._viewers.get(entry_id, 0) + 1
+        try:
+            return await self._async_proxy(request, coordinator, ref)
+        finally:
+            self._viewers[entry_id] -= 1
+
+    async def _async_proxy(self, request, coordinator, ref):
+        client = coordinator.api
+        try:
+            async with client.async_open_stream(ref) as upstream:
+                if upstream.status != 200:
+                    raise web.HTTPBadGateway(
+                        text=f"{coordinator.name} answered {upstream.status}"
+                    )
+                response = web.StreamResponse(
+                    headers={hdrs.CONTENT_TYPE: STREAM_CONTENT_TYPE}
+                )
+                response.enable_chunked_encoding()
+                await response.prepare(request)
+                _LOGGER.debug(f"Streaming {ref} from {client.host}")
+                try:
+                    async for chunk in upstream.content.iter_chunked(STREAM_CHUNK_SIZE):
+                        await response.write(chunk)
+                except ConnectionResetError:
+                    _LOGGER.debug(f"Viewer of {ref} from {client.host} went away")
+                except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+                    # the response is under way, all that is left is to end it
+                    _LOGGER.warning(
+                        f"Stream of {ref} from {client.host} broke: {err!r}"
+                    )
+                return response
+        except BoxUnavailable as err:
+            raise web.HTTPServiceUnavailable(text=str(err)) from err
+        except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+            _LOGGER.warning(f"Streaming {ref} from {client.host} failed: {err!r}")
+            raise web.HTTPBadGateway() from err
@@ -0,0 +1,258 @@
+"""Cached recording timers of dreamboxes"""
+import hashlib
+import logging
+import time
+import xml.etree.ElementTree as ET
+
+_LOGGER = logging.getLogger(__name__)
+
+TIMER_CACHE_TTL = 60
+
+TIMER_STATE_WAITING = 0
+TIMER_STATE_PREPARED = 1
+TIMER_STATE_RUNNING = 2
+TIMER_STATE_ENDED = 3
+
+AFTER_EVENT_AUTO = 3
+
+# the fields a timer sets on a timer of the box with the same key
+_EDITABLE_FIELDS = (
+    "name",
+    "description",
+    "disabled",
+    "justplay",
+    "dirname",
+    "afterevent",
+)
+
+
+def _int(text, default=None):
+    try:
+        return int(text)
+    except (TypeError, ValueError):
+        return default
+
+
+class Timer:
+    """A recording timer.
+
+    A timer is identified by its service and its begin and end time, the
+    way the web interface addresses timers. Fields that are ``None`` are
+    left as they are when the timer is compared or changed.
+    """
+
+    __slots__ = (
+        "ref",
+        "begin",
+        "end",
+        "name",
+        "description",
+        "disabled",
+        "justplay",
+        "dirname",
+        "afterevent",
+        "repeated",
+        "service_name",
+        "state",
+    )
+
+    def __init__(
+        self,
+        ref,
+        begin,
+        end,
+        name=None,
+        description=None,
+        disabled=None,
+        justplay=None,
+        dirname=None,
+        afterevent=None,
+        repeated=0,
+        service_name=None,
+        state=None,
+    ):
+        self.ref = ref
+        self.begin = begin
+        self.end = end
+        self.name = name
+        self.description = description
+        self.disabled = disabled
+        self.justplay = justplay
+        self.dirname = dirname
+        self.afterevent = afterevent
+        self.repeated = repeated
+        self.service_name = service_name
+        self.state = state
+
+    @property
+    def key(self):
+        return (self.ref, self.begin, self.end)
+
+    @classmethod
+    def from_xml(cls, element):
+        def text(tag):
+            value = element.findtext(tag)
+            if value is None or value == "None":
+                return None
+            return value.strip()
+
+        return cls(
+            text("e2servicereference"),
+            _int(text("e2timebegin")),
+            _int(text("e2timeend")),
+            text("e2name") or "",
+            text("e2description") or "",
+            _int(text("e2disabled"), 0) != 0,
+            _int(text("e2justplay"), 0) != 0,
+            text("e2dirname") or None,
+            _int(text("e2afterevent")),
+            _int(text("e2repeated"), 0),
+            text("e2servicename"),
+            _int(text("e2state")),
+        )
+
+    def differs(self, other):
+        """Return whether ``other`` has a field this timer sets differently."""
+        return any(
+            getattr(self, field) is not None
+            and getattr(self, field) != getattr(other, field)
+            for field in _EDITABLE_FIELDS
+        )
+
+    def merged(self, other):
+        """Return ``other`` with the fields this timer sets."""
+        timer = Timer(*(getattr(other, field) for field in Timer.__slots__))
+        for field in _EDITABLE_FIELDS:
+            if getattr(self, field) is not None:
+                setattr(timer, field, getattr(self, field))
+        return timer
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in Timer.__slots__}
+
+
+def parse_timers(text):
+    """Return the timers of an ``e2timerlist``, ``None`` if it is invalid."""
+    try:
+        root = ET.fromstring(text)
+    except ET.ParseError as e:
+        _LOGGER.error(f"Invalid timer list: {e}")
+        return None
+    timers = [Timer.from_xml(element) for element in root.iter("e2timer")]
+    return [t for t in timers if t.ref and t.begin is not None and t.end is not None]
+
+
+class TimerSync:
+    """The requests needed to turn one timer list into another."""
+
+    __slots__ = ("add", "change", "delete", "unchanged")
+
+    def __init__(self, current, desired, delete_missing, now):
+        existing = {timer.key: timer for timer in current}
+        wanted = {timer.key: timer for timer in desired}
+        self.add = [t for key, t in wanted.items() if key not in existing]
+        self.change = [
+            (existing[key], t.merged(existing[key]))
+            for key, t in wanted.items()
+            if key in existing and t.differs(existing[key])
+        ]
+        self.unchanged = len(wanted) - len(self.add) - len(self.change)
+        # running, finished and repeating timers are never removed
+        self.delete = [
+            t
+            for key, t in existing.items()
+            if delete_missing
+            and key not in wanted
+            and not t.repeated
+            and t.begin > now
+            and t.state in (None, TIMER_STATE_WAITING)
+        ]
+
+    def __bool__(self):
+        return bool(self.add or self.change or self.delete)
+
+
+class TimerCache:
+    """Cached timer list of a box.
+
+    The timer list is fetched at most every ``TIMER_CACHE_TTL`` seconds.
+    It is only parsed again if the response changed, the revision of the
+    list is the hash of the raw response. Any change made through the
+    cache invalidates it, the next read fetches the list again.
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self._timers = None
+        self._fetched = None
+        self.revision = None
+
+    def invalidate(self):
+        self._fetched = None
+
+    async def async_timers(self):
+        """Return the timers of the box, ``None`` if they can't be fetched."""
+        now = time.monotonic()
+        if self._fetched is not None and now - self._fetched < TIMER_CACHE_TTL:
+            return self._timers
+        text = await self._client.async_get_timer_list()
+        if text is None:
+            return self._timers
+        revision = hashlib.sha1(text.encode()).hexdigest()
+        if revision != self.revision:
+            timers = parse_timers(text)
+            if timers is None:
+                return self._timers
+            self._timers = timers
+            self.revision = revision
+        self._fetched = now
+        return self._timers
+
+    async def async_add(self, timer):
+        return await self._async_write(self._client.async_add_timer, timer)
+
+    async def async_change(self, old, new):
+        return await self._async_write(self._client.async_change_timer, old, new)
+
+    async def async_delete(self, timer):
+        return await self._async_write(self._client.async_delete_timer, timer)
+
+    async def _async_write(self, func, *args):
+        self.invalidate()
+        result = await func(*args)
+        if result is None:
+            return "Connection failed"
+        if not result.state:
+            return result.text
+        return None
+
+    async def async_sync(self, desired, delete_missing=True):
+        """Add, change and delete timers until the box has ``desired``.
+
+        Only the timers that differ are sent, deletions first to free
+        their tuners for the timers added. Returns the plan and the
+        errors of the requests that failed.
+        """
+        current = await self.async_timers()
+        if current is None:
+            return None, ["Failed to fetch the timer list"]
+        plan = TimerSync(current, desired, delete_missing, time.time())
+        errors = []
+        for timer in plan.delete:
+            error = await self.async_delete(timer)
+            if error:
+                errors.append(f"Deleting {timer.name}: {error}")
+        for old, new in plan.change:
+            error = await self.async_change(old, new)
+            if error:
+                errors.append(f"Changing {old.name}: {error}")
+        for timer in plan.add:
+            error = await self.async_add(timer)
+            if error:
+                errors.append(f"Adding {timer.name}: {error}")
+        if plan:
+            _LOGGER.debug(
+                f"Synced timers of {self._client.host}: {len(plan.add)} added, "
+                f"{len(plan.change)} changed, {len(plan.delete)} deleted"
+            )
+        return plan, errors
@@ -0,0 +1,34 @@
+"""Shared helpers of the dreambox tests."""
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
+
+from dreamboxapi.data import Service, ServiceList
+
+BOUQUET = '1:7:1:0:0:0:0:0:0:0:FROM BOUQUET "userbouquet.{}.tv" ORDER BY bouquet'
+MARKER = "1:64:{}:0:0:0:0:0:0:0::{}"
+
+
+def _element(ref, name):
+    return ET.fromstring(
+        "<e2service>"
+        f"<e2servicereference>{escape(ref)}</e2servicereference>"
+        f"<e2servicename>{escape(name)}</e2servicename>"
+        "</e2service>"
+    )
+
+
+def service(n, name=None):
+    """Return a TV service with a made up reference."""
+    return Service(
+        _element(f"1:0:19:{n:X}:3FB:1:C00000:0:0:0:", name or f"Channel {n}")
+    )
+
+
+def marker(n, name):
+    return Service(_element(MARKER.format(n, name), name))
+
+
+def bouquet(name, services):
+    result = ServiceList(_element(BOUQUET.format(name.lower()), name))
+    result.services = list(services)
+    return result
@@ -0,0 +1,95 @@
+"""Tests for the bouquet lookup tables."""
+from dreambox.bouquets import (
+    BUCKET_DIGITS,
+    BUCKET_OTHER,
+    BouquetIndex,
+    bucket_of,
+    content_hash,
+    normalize_name,
+)
+
+from .helpers import bouquet, marker, service
+
+
+def _index():
+    news = bouquet(
+        "News",
+        [marker(1, "News"), service(1, "Das Erste HD"), service(2, "ZDF Sport")],
+    )
+    sports = bouquet("Sports", [service(3, "Eurosport 1"), service(1, "Das Erste HD")])
+    favourites = bouquet("Favourites", [news, service(4, "3sat"), service(5, "Ärte")])
+    return news, sports, favourites, BouquetIndex([news, sports, favourites], "1")
+
+
+def test_normalize_name():
+    assert normalize_name("Das Erste HD") == "daserstehd"
+    assert normalize_name("ÄRTE") == normalize_name("arte")
+
+
+def test_bucket_of():
+    assert bucket_of("zdf") == "Z"
+    assert bucket_of("3sat") == BUCKET_DIGITS
+    assert bucket_of("Ärte") == "A"
+    assert bucket_of("++") == BUCKET_OTHER
+
+
+def test_content_hash():
+    raw = {"lists": ["<a/>"], "services": {"ref": "<b/>"}}
+    assert content_hash(raw) == content_hash(
+        {"lists": ["<a/>"], "services": {"ref": "<b/>"}}
+    )
+    assert content_hash(raw) != content_hash(
+        {"lists": ["<a/>"], "services": {"ref": "<c/>"}}
+    )
+
+
+def test_resolve_by_reference_and_name():
+    news, sports, _, index = _index()
+    first = news.services[1]
+    assert index.resolve(first.ref) == (first, news)
+    assert index.resolve("das erste hd") == (first, news)
+    assert index.resolve("DAS ERSTE HD", [sports.ref]) == (first, sports)
+    assert index.resolve("arte")[0].name == "Ärte"
+    assert index.resolve("No such channel") == (None, None)
+
+
+def test_markers_and_sub_bouquets_are_not_indexed():
+    news, _, favourites, index = _index()
+    for entry in (news.services[0], news):
+        assert index.resolve(entry.ref) == (None, None)
+        assert index.resolve(entry.name)[0] is not entry
+        assert index.bouquets_for(entry.ref) == []
+        assert index.position(favourites.ref, entry.ref) is None
+    assert [s.name for s in index.playable(favourites.ref)] == ["3sat", "Ärte"]
+    assert index.position(favourites.ref, favourites.services[2].ref) == 1
+
+
+def test_bouquets_for():
+    news, sports, _, index = _index()
+    assert index.bouquets_for(news.services[1].ref) == [news, sports]
+
+
+def test_buckets():
+    _, _, favourites, index = _index()
+    buckets = index.buckets(favourites.ref)
+    assert list(buckets) == ["A", BUCKET_DIGITS]
+    assert [s.name for s in buckets["A"]] == ["Ärte"]
+
+
+def test_search():
+    news, _, _, index = _index()
+    assert [s.name for s in index.search("z")] == ["ZDF Sport"]
+    assert [s.name for s in index.search("erste")] == ["Das Erste HD"]
+    assert len(index.search("sport")) == 2
+    assert len(index.search("sport", limit=1)) == 1
+    assert [s.name for s in index.search("sport", news.ref)] == ["ZDF Sport"]
+    assert index.search("news") == []
+
+
+def test_prepare_keeps_results():
+    news, _, _, index = _index()
+    expected = [s.ref for s in index.search("sport")]
+    _, _, _, prepared = _index()
+    assert prepared.prepare() is prepared
+    assert [s.ref for s in prepared.search("sport")] == expected
+    assert prepared.search("sport", news.ref)[0].ref == news.services[2].ref
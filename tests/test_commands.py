@@ -0,0 +1,124 @@
+"""Tests for the coalescing of volume and channel steps."""
+import asyncio
+
+import pytest
+
+from dreambox.bouquets import BouquetIndex
+from dreambox.commands import VOLUME_STEP, CommandQueue
+
+from .helpers import bouquet, service
+
+pytestmark = pytest.mark.asyncio
+
+
+class Hass:
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+
+    def async_create_task(self, coro):
+        return self.loop.create_task(coro)
+
+
+class Volume:
+    def __init__(self, volume):
+        self.volume = volume
+        self.muted = False
+
+
+class Client:
+    """Records the requests the queue sends."""
+
+    def __init__(self, volume=None, current=None, services=()):
+        self._volume = Volume(volume) if volume is not None else None
+        self.current = current
+        self.bouquet = bouquet("Favourites", services) if services else None
+        self.sent = []
+
+    @property
+    def index(self):
+        return BouquetIndex([self.bouquet] if self.bouquet else [], "1")
+
+    @property
+    def muted(self):
+        return self._volume.muted if self._volume else None
+
+    @property
+    def volume(self):
+        return self._volume.volume if self._volume else 0
+
+    async def async_get_volume(self):
+        self.sent.append("get")
+
+    async def async_set_volume(self, target):
+        self.sent.append(f"set {target}")
+
+    async def async_volume_up(self):
+        self.sent.append("up")
+
+    async def async_volume_down(self):
+        self.sent.append("down")
+
+    async def async_play_service(self, target, bouquet):
+        self.sent.append(f"zap {target.name}")
+
+    async def async_channel_up(self):
+        self.sent.append("channel up")
+
+    async def async_channel_down(self):
+        self.sent.append("channel down")
+
+    async def async_command(self, name):
+        self.sent.append(name)
+
+
+async def test_volume_steps_become_one_request():
+    client = Client(volume=40)
+    queue = CommandQueue(Hass(), client)
+    await asyncio.gather(*(queue.async_volume_step(1) for _ in range(3)))
+    assert client.sent == [f"set {40 + 3 * VOLUME_STEP}"]
+
+
+async def test_opposite_volume_steps_cancel_out():
+    client = Client(volume=40)
+    queue = CommandQueue(Hass(), client)
+    await asyncio.gather(queue.async_volume_step(1), queue.async_volume_step(-1))
+    assert client.sent == []
+
+
+async def test_volume_is_clamped():
+    client = Client(volume=95)
+    queue = CommandQueue(Hass(), client)
+    await asyncio.gather(*(queue.async_volume_step(1) for _ in range(3)))
+    assert client.sent == ["set 100"]
+
+
+async def test_unknown_volume_is_stepped_by_the_box():
+    client = Client()
+    queue = CommandQueue(Hass(), client)
+    await asyncio.gather(queue.async_volume_step(-1), queue.async_volume_step(-1))
+    assert client.sent == ["get", "down", "down"]
+
+
+async def test_channel_steps_become_one_zap():
+    services = [service(n) for n in range(5)]
+    client = Client(current=services[3], services=services)
+    queue = CommandQueue(Hass(), client)
+    await asyncio.gather(*(queue.async_channel_step(1) for _ in range(3)))
+    assert client.sent == ["zap Channel 1"]
+
+
+async def test_unknown_service_is_stepped_by_the_box():
+    client = Client(current=service(9), services=[service(n) for n in range(5)])
+    queue = CommandQueue(Hass(), client)
+    await asyncio.gather(queue.async_channel_step(-1), queue.async_channel_step(-1))
+    assert client.sent == ["channel down", "channel down"]
+
+
+async def test_commands_flush_pending_steps_in_order():
+    client = Client(volume=40)
+    queue = CommandQueue(Hass(), client)
+    step = asyncio.ensure_future(queue.async_volume_step(1))
+    await asyncio.sleep(0)
+    await queue.async_run(client.async_command, "mute")
+    await step
+    assert client.sent == [f"set {40 + VOLUME_STEP}", "mute"]
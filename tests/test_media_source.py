@@ -0,0 +1,47 @@
+"""Tests for the media source identifiers."""
+import pytest
+
+from dreambox.media_source import (
+    KIND_DIRECTORY,
+    KIND_RECORDING,
+    KIND_SERVICE,
+    directory_identifier,
+    parse_identifier,
+    recording_identifier,
+    service_identifier,
+)
+
+ENTRY = "01HBJGXJ7M1X8Q3ZP2D2T7K2X9"
+SERVICE = "1:0:19:283D:3FB:1:C00000:0:0:0:"
+RECORDING = "/media/hdd/movie/20240101 2015 - Das Erste HD - Tagesschau.ts"
+
+
+@pytest.mark.parametrize(
+    "identifier, expected",
+    [
+        (ENTRY, (ENTRY, None, None, 0)),
+        (
+            directory_identifier(ENTRY, "/media/hdd/movie/"),
+            (ENTRY, KIND_DIRECTORY, "/media/hdd/movie/", 0),
+        ),
+        (
+            directory_identifier(ENTRY, "/media/hdd/movie/", 3),
+            (ENTRY, KIND_DIRECTORY, "/media/hdd/movie/", 3),
+        ),
+        (recording_identifier(ENTRY, RECORDING), (ENTRY, KIND_RECORDING, RECORDING, 0)),
+        (service_identifier(ENTRY, SERVICE), (ENTRY, KIND_SERVICE, SERVICE, 0)),
+        (
+            service_identifier(ENTRY, f"4097:0:1:0:0:0:0:0:0:0:{RECORDING}"),
+            (ENTRY, KIND_SERVICE, f"4097:0:1:0:0:0:0:0:0:0:{RECORDING}", 0),
+        ),
+    ],
+)
+def test_round_trip(identifier, expected):
+    assert parse_identifier(identifier) == expected
+
+
+@pytest.mark.parametrize(
+    "identifier", [None, "", f"{ENTRY}/", f"{ENTRY}/x/path", f"{ENTRY}/dnopath"]
+)
+def test_invalid(identifier):
+    assert parse_identifier(identifier) == (None, None, None, 0)
@@ -0,0 +1,55 @@
+"""Tests for the poll phase alignment."""
+from datetime import timedelta
+
+import pytest
+
+from dreambox.scheduler import PollScheduler
+
+INTERVAL = timedelta(seconds=60)
+
+
+class Loop:
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+class Hass:
+    def __init__(self, now=0.0):
+        self.loop = Loop(now)
+
+
+def _scheduler(boxes, now=0.0):
+    scheduler = PollScheduler(Hass(now))
+    for box in boxes:
+        scheduler.register(box)
+    return scheduler
+
+
+def test_phase():
+    scheduler = _scheduler(["a", "b", "c"])
+    assert [scheduler.phase(box, INTERVAL) for box in "abc"] == [0, 20, 40]
+    assert scheduler.phase("unknown", INTERVAL) == 0
+
+
+def test_single_box_is_not_shifted():
+    assert _scheduler(["a"], 17.0).align("a", INTERVAL) == INTERVAL
+
+
+@pytest.mark.parametrize("now", [0.0, 7.5, 29.0, 31.0, 59.9, 1234.5])
+def test_align_lands_on_phase(now):
+    scheduler = _scheduler(["a", "b", "c", "d"], now)
+    for box in "abcd":
+        delay = scheduler.align(box, INTERVAL).total_seconds()
+        assert 30 <= delay <= 90
+        offset = (now + delay - scheduler.phase(box, INTERVAL)) % 60
+        assert min(offset, 60 - offset) == pytest.approx(0, abs=1e-6)
+
+
+def test_unregister_moves_phases():
+    scheduler = _scheduler(["a", "b", "c"])
+    scheduler.unregister("b")
+    scheduler.unregister("b")
+    assert scheduler.phase("c", INTERVAL) == 30
@@ -0,0 +1,38 @@
+"""Tests for the service call schemas."""
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+import voluptuous as vol
+from homeassistant.util import dt as dt_util
+
+from dreambox.services import TIMER_SCHEMA, _timestamp
+
+
+@pytest.fixture(autouse=True)
+def berlin():
+    default = dt_util.DEFAULT_TIME_ZONE
+    dt_util.set_default_time_zone(ZoneInfo("Europe/Berlin"))
+    yield
+    dt_util.set_default_time_zone(default)
+
+
+def _timer(start, end):
+    return TIMER_SCHEMA(
+        {"config_entry_id": "entry", "channel": "Das Erste", "start": start, "end": end}
+    )
+
+
+def test_naive_times_are_in_the_configured_time_zone():
+    data = _timer("2026-10-19 20:00", "2026-10-19 20:15")
+    assert data["start"] == datetime(2026, 10, 19, 18, 0, tzinfo=timezone.utc)
+    assert _timestamp(data["start"]) == 1792432800
+
+
+def test_naive_and_aware_times_can_be_mixed():
+    data = _timer(
+        "2026-10-19 20:00", datetime(2026, 10, 19, 18, 15, tzinfo=timezone.utc)
+    )
+    assert _timestamp(data["end"]) - _timestamp(data["start"]) == 15 * 60
+    with pytest.raises(vol.Invalid):
+        _timer("2026-10-19 20:00", datetime(2026, 10, 19, 17, 0, tzinfo=timezone.utc))
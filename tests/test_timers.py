@@ -0,0 +1,76 @@
+"""Tests for the timer list diffing."""
+from dreambox.timers import (
+    TIMER_STATE_RUNNING,
+    TIMER_STATE_WAITING,
+    Timer,
+    TimerSync,
+    parse_timers,
+)
+
+REF = "1:0:19:1:3FB:1:C00000:0:0:0:"
+NOW = 1_000_000
+
+
+def _timer(begin, **kwargs):
+    kwargs.setdefault("state", TIMER_STATE_WAITING)
+    return Timer(REF, NOW + begin, NOW + begin + 1800, **kwargs)
+
+
+def test_parse_timers():
+    timers = parse_timers(
+        "<e2timerlist><e2timer>"
+        f"<e2servicereference>{REF}</e2servicereference>"
+        "<e2servicename>Das Erste HD</e2servicename>"
+        "<e2name>Tagesschau</e2name><e2description>None</e2description>"
+        "<e2timebegin>100</e2timebegin><e2timeend>200</e2timeend>"
+        "<e2disabled>0</e2disabled><e2justplay>1</e2justplay>"
+        "<e2afterevent>1</e2afterevent><e2state>0</e2state>"
+        "</e2timer><e2timer><e2name>Broken</e2name></e2timer></e2timerlist>"
+    )
+    assert len(timers) == 1
+    timer = timers[0]
+    assert timer.key == (REF, 100, 200)
+    assert timer.name == "Tagesschau"
+    assert timer.description == ""
+    assert timer.justplay is True
+    assert timer.afterevent == 1
+    assert parse_timers("<e2timerlist>") is None
+
+
+def test_sync_adds_changes_and_deletes():
+    current = [_timer(0, name="A"), _timer(3600, name="B"), _timer(7200, name="C")]
+    desired = [
+        Timer(REF, NOW, NOW + 1800, name="A"),
+        Timer(REF, NOW + 3600, NOW + 5400, name="B2"),
+        Timer(REF, NOW + 9000, NOW + 10800, name="D"),
+    ]
+    plan = TimerSync(current, desired, True, NOW - 1)
+    assert [t.name for t in plan.add] == ["D"]
+    assert [(old.name, new.name) for old, new in plan.change] == [("B", "B2")]
+    assert [t.name for t in plan.delete] == ["C"]
+    assert plan.unchanged == 1
+    assert plan
+
+
+def test_sync_keeps_what_it_should_not_touch():
+    current = [
+        _timer(0, name="running", state=TIMER_STATE_RUNNING),
+        _timer(3600, name="repeated", repeated=127),
+        _timer(-7200, name="past"),
+    ]
+    assert not TimerSync(current, [], True, NOW)
+    assert not TimerSync([_timer(3600, name="kept")], [], False, NOW)
+
+
+def test_unset_fields_are_left_alone():
+    existing = _timer(0, name="A", description="text", dirname="/hdd/", afterevent=1)
+    wanted = Timer(REF, NOW, NOW + 1800, name="A")
+    assert not wanted.differs(existing)
+    renamed = Timer(REF, NOW, NOW + 1800, name="B")
+    assert renamed.differs(existing)
+    merged = renamed.merged(existing)
+    assert merged.name == "B"
+    assert merged.description == "text"
+    assert merged.dirname == "/hdd/"
+    assert merged.afterevent == 1
+    assert existing.name == "A"